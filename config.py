@@ -27,3 +27,31 @@ AD_API = getenv("AD_API", None)
 STRING = getenv("STRING", None)
 YT_COOKIES = getenv("YT_COOKIES", None)
 INSTA_COOKIES = getenv("INSTA_COOKIES", None)
+USERBOT_POOL_SIZE = int(getenv("USERBOT_POOL_SIZE", "100"))
+USERBOT_IDLE_TTL = int(getenv("USERBOT_IDLE_TTL", "900"))
+FREE_BATCH_WORKERS = int(getenv("FREE_BATCH_WORKERS", "1"))
+PREMIUM_BATCH_WORKERS = int(getenv("PREMIUM_BATCH_WORKERS", "4"))
+BATCH_RATE = float(getenv("BATCH_RATE", "0.5"))
+BATCH_PREFETCH = int(getenv("BATCH_PREFETCH", "2"))
+BATCH_DISK_BUDGET = int(getenv("BATCH_DISK_BUDGET_MB", "4096")) * 1024**2
+MONGO_MAX_POOL_SIZE = int(getenv("MONGO_MAX_POOL_SIZE", "50"))
+MONGO_MIN_POOL_SIZE = int(getenv("MONGO_MIN_POOL_SIZE", "0"))
+MONGO_TIMEOUT_MS = int(getenv("MONGO_TIMEOUT_MS", "20000"))
+MONGO_READ_PREFERENCE = getenv("MONGO_READ_PREFERENCE", "primary")
+MEDIA_PROBE_WORKERS = int(getenv("MEDIA_PROBE_WORKERS", "4"))
+PARALLEL_DOWNLOAD_CONNECTIONS = int(getenv("PARALLEL_DOWNLOAD_CONNECTIONS", "4"))
+# Pyrogram lets only this many downloads and uploads run at once on one client
+MAX_CONCURRENT_TRANSMISSIONS = int(getenv("MAX_CONCURRENT_TRANSMISSIONS", str(2 * PARALLEL_DOWNLOAD_CONNECTIONS)))
+PROGRESS_EDIT_INTERVAL = float(getenv("PROGRESS_EDIT_INTERVAL", "5"))
+TRANSFER_SLOTS = int(getenv("TRANSFER_SLOTS", "8"))
+PREMIUM_USER_SLOTS = int(getenv("PREMIUM_USER_SLOTS", "2"))
+FREE_SLOT_SHARE = float(getenv("FREE_SLOT_SHARE", "0.5"))
+PREMIUM_QUEUE_LIMIT = int(getenv("PREMIUM_QUEUE_LIMIT", "5"))
+BOT_ROLE = getenv("BOT_ROLE", "all").lower()  # all, frontend or worker
+JOB_POLL_INTERVAL = int(getenv("JOB_POLL_INTERVAL", "5"))
+FILE_CACHE_SIZE = int(getenv("FILE_CACHE_MB", "2048")) * 1024**2
+SCRATCH_DIR = getenv("SCRATCH_DIR", "downloads")
+SCRATCH_MIN_FREE = int(getenv("SCRATCH_MIN_FREE_MB", "512")) * 1024**2
+YTDL_WORKERS = int(getenv("YTDL_WORKERS", "2"))
+FREE_DL_SIZE = int(getenv("FREE_DL_SIZE_MB", "2000")) * 1024**2
+PREMIUM_DL_SIZE = int(getenv("PREMIUM_DL_SIZE_MB", "4000")) * 1024**2
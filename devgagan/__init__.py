@@ -16,9 +16,10 @@ import asyncio
 import logging
 from pyrogram import Client
 from pyrogram.enums import ParseMode 
-from config import API_ID, API_HASH, BOT_TOKEN, STRING, MONGO_DB
+from config import API_ID, API_HASH, BOT_TOKEN, STRING, BOT_ROLE, MAX_CONCURRENT_TRANSMISSIONS
 from telethon.sync import TelegramClient
-from motor.motor_asyncio import AsyncIOMotorClient
+from telethon.sessions import StringSession
+from devgagan.core.mongo.client import tokens as token
 import time
 
 loop = asyncio.get_event_loop()
@@ -30,24 +31,33 @@ logging.basicConfig(
 
 botStartTime = time.time()
 
+# Transfer workers log in with in-memory sessions and ignore updates: only the
+# front-end (or an all-in-one process) answers commands
+WORKER = BOT_ROLE == "worker"
+
 app = Client(
     ":RestrictBot:",
     api_id=API_ID,
     api_hash=API_HASH,
     bot_token=BOT_TOKEN,
     workers=50,
-    parse_mode=ParseMode.MARKDOWN
+    parse_mode=ParseMode.MARKDOWN,
+    in_memory=WORKER,
+    no_updates=WORKER,
+    max_concurrent_transmissions=MAX_CONCURRENT_TRANSMISSIONS
 )
 
-pro = Client("ggbot", api_id=API_ID, api_hash=API_HASH, session_string=STRING)
+pro = Client(
+    "ggbot", api_id=API_ID, api_hash=API_HASH, session_string=STRING,
+    max_concurrent_transmissions=MAX_CONCURRENT_TRANSMISSIONS
+)
 
-sex = TelegramClient('sexrepo', API_ID, API_HASH).start(bot_token=BOT_TOKEN)
+sex = TelegramClient(
+    StringSession() if WORKER else 'sexrepo', API_ID, API_HASH, receive_updates=not WORKER
+).start(bot_token=BOT_TOKEN)
 
 
-# MongoDB setup
-tclient = AsyncIOMotorClient(MONGO_DB)
-tdb = tclient["telegram_bot"]  # Your database
-token = tdb["tokens"]  # Your tokens collection
+# MongoDB setup: `token` is the tokens collection of the shared client in core/mongo/client.py
 
 async def create_ttl_index():
     """Ensure the TTL index exists for the `tokens` collection."""
@@ -17,22 +17,94 @@ import importlib
 import gc
 from pyrogram import idle
 from devgagan.modules import ALL_MODULES
-from devgagan.core.mongo.plans_db import check_and_remove_expired_users
-from aiojobs import create_scheduler
+import datetime
+from devgagan.core.mongo.plans_db import check_and_remove_expired_users, create_expiry_index, next_expiry, plan_changed
+from devgagan.core.userbot_pool import userbot_pool
+from devgagan.core.mongo.settings_db import create_settings_index, create_lock_index, load_locked_channels, refresh_locked_channels
+from devgagan.core.mongo.users_db import create_user_index
+from devgagan.core.mongo.jobs_db import create_job_index
+from devgagan.core.mongo.cache_db import create_file_id_index
+from devgagan.core.scratch import clean_scratch
+from config import BOT_ROLE, JOB_POLL_INTERVAL
 
 # ----------------------------Bot-Start---------------------------- #
 
 loop = asyncio.get_event_loop()
 
-# Function to schedule expiry checks
+MAX_EXPIRY_SLEEP = 3600
+
+# Sleep until the next plan expires (or a plan is added) instead of polling
 async def schedule_expiry_check():
-    scheduler = await create_scheduler()
+    await create_expiry_index()
     while True:
-        await scheduler.spawn(check_and_remove_expired_users())
-        await asyncio.sleep(60)  # Check every hour
+        plan_changed.clear()
+        delay = MAX_EXPIRY_SLEEP
+        try:
+            await check_and_remove_expired_users()
+            expiry = await next_expiry()
+            if expiry:
+                delay = min(max((expiry - datetime.datetime.utcnow()).total_seconds(), 1), MAX_EXPIRY_SLEEP)
+        except Exception as e:
+            print(f"Expiry check error: {e}")
+            delay = 60
         gc.collect()
+        try:
+            await asyncio.wait_for(plan_changed.wait(), timeout=delay)
+        except asyncio.TimeoutError:
+            pass
+
+# Stop userbots that sat idle past USERBOT_IDLE_TTL
+async def schedule_userbot_reaper():
+    while True:
+        await asyncio.sleep(60)
+        try:
+            await userbot_pool.reap()
+        except Exception as e:
+            print(f"Userbot reaper error: {e}")
+
+# Pick up channels locked by other instances of the bot
+async def schedule_locked_channel_refresh():
+    while True:
+        await asyncio.sleep(300)
+        try:
+            await refresh_locked_channels()
+        except Exception as e:
+            print(f"Locked channel refresh error: {e}")
+
+# Run queued batches and resume those left behind by a restart, once their old
+# worker stops heartbeating. Transfer workers poll more often than all-in-one bots.
+async def schedule_job_resume():
+    from devgagan.modules.main import resume_batch_jobs
+    interval = JOB_POLL_INTERVAL if BOT_ROLE == "worker" else 60
+    while True:
+        try:
+            resumed = await resume_batch_jobs()
+            if resumed:
+                print(f"Picked up {resumed} batch jobs ...")
+        except Exception as e:
+            print(f"Job resume error: {e}")
+        await asyncio.sleep(interval)
+
+# Remove job folders and partial files left behind by crashes
+async def schedule_scratch_janitor():
+    while True:
+        await asyncio.sleep(1800)
+        try:
+            removed, freed = await asyncio.to_thread(clean_scratch)
+            if removed:
+                print(f"Janitor removed {removed} leftovers ({freed} bytes)")
+        except Exception as e:
+            print(f"Scratch janitor error: {e}")
 
 async def devggn_boot():
+    await create_user_index()
+    await create_job_index()
+    await create_file_id_index()
+    await create_settings_index()
+    await create_lock_index()
+    removed, freed = await asyncio.to_thread(clean_scratch, True)
+    print(f"Cleaned {removed} leftover downloads ({freed} bytes) ...")
+    print(f"Loaded {await load_locked_channels()} locked channels ...")
     for all_module in ALL_MODULES:
         importlib.import_module("devgagan.modules." + all_module)
     print("""
@@ -51,8 +123,15 @@ async def devggn_boot():
 ---------------------------------------------------
 """)
 
-    asyncio.create_task(schedule_expiry_check())
-    print("Auto removal started ...")
+    if BOT_ROLE != "worker":
+        asyncio.create_task(schedule_expiry_check())
+        print("Auto removal started ...")
+    asyncio.create_task(schedule_userbot_reaper())
+    asyncio.create_task(schedule_locked_channel_refresh())
+    asyncio.create_task(schedule_scratch_janitor())
+    if BOT_ROLE != "frontend":
+        asyncio.create_task(schedule_job_resume())
+    print(f"Running as {BOT_ROLE} ...")
     await idle()
     print("Bot stopped...")
 
@@ -0,0 +1,220 @@
+# ---------------------------------------------------
+# File Name: batch.py
+# Description: A Pyrogram bot for downloading files from Telegram channels or groups
+#              and uploading them back to Telegram.
+# Author: Gagan
+# GitHub: https://github.com/devgaganin/
+# Telegram: https://t.me/team_spy_pro
+# YouTube: https://youtube.com/@dev_gagan
+# Created: 2025-01-11
+# Last Modified: 2025-01-11
+# Version: 2.0.5
+# License: MIT License
+# ---------------------------------------------------
+
+import asyncio
+import time
+from pyrogram.errors import FloodWait
+from devgagan.core.func import humanbytes
+from devgagan.core.journal import ResumableError
+
+RESUME_DELAY = 5  # seconds before retrying a resumable transfer, times the attempt number
+
+
+class TokenBucket:
+    """Async token bucket that slows itself down whenever Telegram answers with FloodWait.
+
+    Every FloodWait pauses the bucket for the requested time and halves the refill
+    rate; each successful item then nudges the rate back towards ``max_rate``.
+    """
+
+    def __init__(self, rate, capacity=1, min_rate=0.02):
+        self.max_rate = rate
+        self.rate = rate
+        self.min_rate = min(min_rate, rate)
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    await asyncio.sleep(self.paused_until - now)
+                    continue
+                self._refill(now)
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def flood_wait(self, seconds):
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+        self.rate = max(self.min_rate, self.rate / 2)
+        self.tokens = 0
+
+    def success(self):
+        self.rate = min(self.max_rate, self.rate + self.max_rate / 10)
+
+
+class StageStats:
+    """Bytes moved and busy time per pipeline stage (download / upload)."""
+
+    def __init__(self):
+        self.stages = {}
+
+    def record(self, stage, size, seconds):
+        total = self.stages.setdefault(stage, [0, 0.0])
+        total[0] += size
+        total[1] += seconds
+
+    def rate(self, stage):
+        size, seconds = self.stages.get(stage, (0, 0.0))
+        return size / seconds if seconds > 0 else 0
+
+    def summary(self):
+        parts = []
+        for stage, icon in (("download", "⬇️"), ("upload", "⬆️")):
+            if stage in self.stages:
+                parts.append(f"{icon} {humanbytes(self.rate(stage)) or '0 B'}/s")
+        return " | ".join(parts)
+
+
+class DeliveryOrder:
+    """Lets items be prepared concurrently while delivering them strictly in order.
+
+    ``disk_budget`` caps the bytes of downloaded-but-not-yet-delivered files; the
+    item whose turn it is may always download so the batch can never stall.
+    """
+
+    def __init__(self, disk_budget=None, stats=None):
+        self._next = 0
+        self._finished = set()
+        self._cond = asyncio.Condition()
+        self.disk_budget = disk_budget
+        self.disk_used = 0
+        self.stats = stats
+
+    @property
+    def delivered(self):
+        """How many leading positions are delivered (or given up) in order."""
+        return self._next
+
+    def turn(self, position):
+        return DeliveryTurn(self, position)
+
+    async def _wait(self, position):
+        async with self._cond:
+            await self._cond.wait_for(lambda: self._next >= position)
+
+    async def _reserve(self, position, size):
+        async with self._cond:
+            await self._cond.wait_for(
+                lambda: self._next >= position or self.disk_used + size <= self.disk_budget
+            )
+            self.disk_used += size
+
+    async def _finish(self, position, reserved):
+        async with self._cond:
+            self.disk_used = max(self.disk_used - reserved, 0)
+            self._finished.add(position)
+            while self._next in self._finished:
+                self._finished.discard(self._next)
+                self._next += 1
+            self._cond.notify_all()
+
+
+class DeliveryTurn:
+    def __init__(self, order, position):
+        self.order = order
+        self.position = position
+        self.reserved = 0
+
+    async def wait(self):
+        """Block until every earlier item has been delivered (or given up)."""
+        await self.order._wait(self.position)
+
+    async def reserve(self, size):
+        """Claim disk budget before a download; given back in ``done``."""
+        if self.order.disk_budget and size > self.reserved:
+            await self.order._reserve(self.position, size - self.reserved)
+            self.reserved = size
+
+    def record(self, stage, size, seconds):
+        if self.order.stats:
+            self.order.stats.record(stage, size, seconds)
+
+    async def done(self):
+        await self.order._finish(self.position, self.reserved)
+        self.reserved = 0
+
+
+async def run_batch(indexes, handler, concurrency, limiter, should_continue, on_item_done=None, max_flood_retries=3, disk_budget=None, stats=None, max_resume_retries=2):
+    """Run ``handler(index, turn)`` for every index with at most ``concurrency`` in flight.
+
+    ``handler`` must await ``turn.wait()`` before sending anything to the target
+    chat so results land in index order; while one item uploads, later ones keep
+    downloading within ``disk_budget`` bytes. ``limiter`` paces item starts and backs off on
+    FloodWait, after which the handler runs again: it must raise only before the
+    item reaches the target chat and record its own partial progress (e.g. the
+    upload journal of split parts) so a rerun does not send anything twice. An item that fails with ``ResumableError`` is retried up to
+    ``max_resume_retries`` times and continues from its on-disk journal. Stops
+    picking new items once ``should_continue()`` is false. ``on_item_done`` gets
+    the number of finished items, the item's index and how many leading items are
+    delivered in order (a safe resume point). Returns the number of finished
+    items and the indexes given up on after their retries ran out.
+    """
+    order = DeliveryOrder(disk_budget, stats)
+    queue = asyncio.Queue()
+    for position, index in enumerate(indexes):
+        queue.put_nowait((position, index))
+    completed = 0
+    skipped = []
+
+    async def worker():
+        nonlocal completed
+        while should_continue():
+            try:
+                position, index = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            turn = order.turn(position)
+            try:
+                floods = resumes = 0
+                while floods <= max_flood_retries:
+                    await limiter.acquire()
+                    try:
+                        await handler(index, turn)
+                        limiter.success()
+                        break
+                    except FloodWait as fw:
+                        floods += 1
+                        limiter.flood_wait(fw.value)
+                    except ResumableError:
+                        resumes += 1
+                        if resumes > max_resume_retries:
+                            raise
+                        await asyncio.sleep(RESUME_DELAY * resumes)
+                else:
+                    raise RuntimeError(f"still flood-waited after {max_flood_retries} retries")
+            except Exception as e:
+                print(f"Batch item {index} failed: {e}")
+                skipped.append(index)
+            finally:
+                await turn.done()
+            completed += 1
+            if on_item_done:
+                try:
+                    await on_item_done(completed, index, order.delivered)
+                except Exception:
+                    pass
+
+    await asyncio.gather(*(worker() for _ in range(max(1, concurrency))))
+    return completed, sorted(skipped)
@@ -0,0 +1,124 @@
+# ---------------------------------------------------
+# File Name: file_cache.py
+# Description: A Pyrogram bot for downloading files from Telegram channels or groups
+#              and uploading them back to Telegram.
+# Author: Gagan
+# GitHub: https://github.com/devgaganin/
+# Telegram: https://t.me/team_spy_pro
+# YouTube: https://youtube.com/@dev_gagan
+# Created: 2025-01-11
+# Last Modified: 2025-01-11
+# Version: 2.0.5
+# License: MIT License
+# ---------------------------------------------------
+
+import hashlib
+import os
+import shutil
+from collections import OrderedDict
+from config import FILE_CACHE_SIZE
+
+CACHE_DIR = "cache"
+
+
+def media_cache_key(msg):
+    """(chat_id, msg_id, file_unique_id) of a media message, or None without media."""
+    media = getattr(msg, msg.media.value, None) if msg.media else None
+    unique_id = getattr(media, "file_unique_id", None)
+    if not unique_id or not msg.chat:
+        return None
+    return (msg.chat.id, msg.id, unique_id)
+
+
+class FileCache:
+    """On-disk LRU of downloaded media, bounded to ``budget`` bytes.
+
+    Entries are hard links to the downloaded file, so caching costs no copy and
+    callers may rename or delete their own path freely.
+    """
+
+    def __init__(self, directory, budget):
+        self.directory = directory
+        self.budget = budget
+        self.entries = None
+        self.size = 0
+
+    def _load(self):
+        # Rebuild the LRU order from what an earlier run left on disk
+        self.entries = OrderedDict()
+        os.makedirs(self.directory, exist_ok=True)
+        files = []
+        for name in os.listdir(self.directory):
+            stat = os.stat(os.path.join(self.directory, name))
+            files.append((stat.st_atime, name, stat.st_size))
+        for _, name, size in sorted(files):
+            self.entries[name] = size
+            self.size += size
+        self._evict()
+
+    def _path(self, key):
+        name = hashlib.sha1(":".join(map(str, key)).encode()).hexdigest()
+        return name, os.path.join(self.directory, name)
+
+    def _evict(self, limit=None):
+        limit = self.budget if limit is None else limit
+        while self.size > limit and self.entries:
+            name, size = self.entries.popitem(last=False)
+            self.size -= size
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass
+
+    def get(self, key, dest):
+        """Place the cached file for ``key`` at ``dest``; returns ``dest`` or None on a miss."""
+        if not key or self.budget <= 0:
+            return None
+        if self.entries is None:
+            self._load()
+        name, path = self._path(key)
+        if name not in self.entries or not os.path.exists(path):
+            return None
+        os.makedirs(os.path.dirname(dest) or ".", exist_ok=True)
+        if os.path.exists(dest):
+            os.remove(dest)
+        try:
+            os.link(path, dest)
+        except OSError:
+            shutil.copyfile(path, dest)
+        os.utime(path)
+        self.entries.move_to_end(name)
+        return dest
+
+    def put(self, key, file):
+        if not key or self.budget <= 0 or not os.path.exists(file):
+            return
+        if self.entries is None:
+            self._load()
+        size = os.path.getsize(file)
+        name, path = self._path(key)
+        if size > self.budget or name in self.entries:
+            return
+        try:
+            os.link(file, path)
+        except OSError:
+            shutil.copyfile(file, path)
+        self.entries[name] = size
+        self.size += size
+        self._evict()
+
+    def shrink(self, size):
+        """Evict least recently used entries until ``size`` bytes are freed."""
+        if self.entries is None:
+            self._load()
+        before = self.size
+        self._evict(max(self.size - size, 0))
+        return before - self.size
+
+    def stats(self):
+        if self.entries is None:
+            self._load()
+        return {"files": len(self.entries), "size": self.size, "budget": self.budget}
+
+
+file_cache = FileCache(CACHE_DIR, FILE_CACHE_SIZE)
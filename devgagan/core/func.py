@@ -15,16 +15,15 @@
 import math
 import time , re
 from pyrogram import enums
-from config import CHANNEL_ID, OWNER_ID 
-from devgagan.core.mongo.plans_db import premium_users
+from config import CHANNEL_ID, OWNER_ID, PROGRESS_EDIT_INTERVAL
+from devgagan.core.mongo.plans_db import is_premium
 from pyrogram.types import InlineKeyboardButton, InlineKeyboardMarkup
 import cv2
 from pyrogram.errors import FloodWait, InviteHashInvalid, InviteHashExpired, UserAlreadyParticipant, UserNotParticipant
 from datetime import datetime as dt
 import asyncio, subprocess, re, os, time
 async def chk_user(message, user_id):
-    user = await premium_users()
-    if user_id in user or user_id in OWNER_ID:
+    if user_id in OWNER_ID or await is_premium(user_id):
         return 0
     else:
         return 1
@@ -88,38 +87,95 @@ PROGRESS_BAR = """\n
 │ **__ETA:__** {4}
 ╰─────────────────────╯
 """
-async def progress_bar(current, total, ud_type, message, start):
-
-    now = time.time()
-    diff = now - start
-    if round(diff % 10.00) == 0 or current == total:
-
-        percentage = current * 100 / total
-        speed = current / diff
-        elapsed_time = round(diff) * 1000
-        time_to_completion = round((total - current) / speed) * 1000
-        estimated_total_time = elapsed_time + time_to_completion
-
-        elapsed_time = TimeFormatter(milliseconds=elapsed_time)
-        estimated_total_time = TimeFormatter(milliseconds=estimated_total_time)
-
-        progress = "{0}{1}".format(
-            ''.join(["♦" for i in range(math.floor(percentage / 10))]),
-            ''.join(["◇" for i in range(10 - math.floor(percentage / 10))]))
-
-        tmp = progress + PROGRESS_BAR.format( 
-            round(percentage, 2),
-            humanbytes(current),
-            humanbytes(total),
-            humanbytes(speed),
+MAX_PROGRESS_INTERVAL = 60
+# (chat id, message id) -> ProgressReporter of that progress message
+_reporters = {}
+
+class ProgressReporter:
+    """Turns transfer callbacks into at most one edit of ``message`` per ``interval``.
+
+    Callbacks only store the latest text and make sure a flusher task runs, so a
+    transfer never waits on Telegram. Identical text is not re-sent and a FloodWait
+    pauses the reporter and doubles its interval. ``edit`` lets the reporter stand
+    in for the message wherever a library edits the progress message itself.
+    """
+
+    def __init__(self, message, key, interval=PROGRESS_EDIT_INTERVAL):
+        self.message = message
+        self.key = key
+        self.interval = interval
+        self.pending = None
+        self.last_text = None
+        self.last_edit = 0
+        self.paused_until = 0
+        self._task = None
+
+    def submit(self, text):
+        self.pending = text
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._flush())
+
+    async def edit(self, text, *args, **kwargs):
+        self.submit(text)
+
+    async def _flush(self):
+        while True:
+            delay = max(self.last_edit + self.interval, self.paused_until) - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if self.pending is None:
+                # Idle for a whole interval: forget this message
+                if _reporters.get(self.key) is self:
+                    del _reporters[self.key]
+                return
+            text, self.pending = self.pending, None
+            if text == self.last_text:
+                continue
+            try:
+                await self.message.edit(text)
+                self.last_text = text
+            except Exception as e:
+                wait = getattr(e, "value", None) if isinstance(e, FloodWait) else getattr(e, "seconds", None)
+                if isinstance(wait, (int, float)):
+                    self.paused_until = time.monotonic() + wait
+                    self.interval = min(self.interval * 2, MAX_PROGRESS_INTERVAL)
+                    if self.pending is None:
+                        self.pending = text
+            self.last_edit = time.monotonic()
+
+def progress_reporter(message):
+    """Return the shared reporter of a Pyrogram or Telethon progress message."""
+    chat_id = getattr(message, "chat_id", None) or message.chat.id
+    key = (chat_id, message.id)
+    reporter = _reporters.get(key)
+    if reporter is None:
+        reporter = _reporters[key] = ProgressReporter(message, key)
+    return reporter
+
+def render_progress(current, total, ud_type, start):
+    diff = max(time.time() - start, 0.001)
+    percentage = current * 100 / total if total else 100
+    speed = current / diff
+    elapsed_time = round(diff) * 1000
+    time_to_completion = round((total - current) / speed) * 1000 if speed else 0
+    estimated_total_time = TimeFormatter(milliseconds=elapsed_time + time_to_completion)
+
+    progress = "{0}{1}".format(
+        ''.join(["♦" for i in range(math.floor(percentage / 10))]),
+        ''.join(["◇" for i in range(10 - math.floor(percentage / 10))]))
+
+    tmp = progress + PROGRESS_BAR.format(
+        round(percentage, 2),
+        humanbytes(current),
+        humanbytes(total),
+        humanbytes(speed),
+
+        estimated_total_time if estimated_total_time != '' else "0 s"
+    )
+    return "{}\n│ {}".format(ud_type, tmp)
 
-            estimated_total_time if estimated_total_time != '' else "0 s"
-        )
-        try:
-            await message.edit(
-                text="{}\n│ {}".format(ud_type, tmp),)             
-        except:
-            pass
+async def progress_bar(current, total, ud_type, message, start):
+    progress_reporter(message).submit(render_progress(current, total, ud_type, start))
 
 def humanbytes(size):
     if not size:
@@ -230,60 +286,26 @@ async def screenshot(video, duration, sender):
         return out
     else:
         None  
-last_update_time = time.time()
-async def progress_callback(current, total, progress_message):
-    percent = (current / total) * 100
-    global last_update_time
-    current_time = time.time()
+def upload_progress_text(current, total):
+    percent = (current / total) * 100 if total else 100
+    completed_blocks = int(percent // 10)
+    remaining_blocks = 10 - completed_blocks
+    progress_bar = "♦" * completed_blocks + "◇" * remaining_blocks
+    current_mb = current / (1024 * 1024)
+    total_mb = total / (1024 * 1024)
+    return (
+        f"╭──────────────────╮\n"
+        f"│        **__Uploading...__**       \n"
+        f"├──────────\n"
+        f"│ {progress_bar}\n\n"
+        f"│ **__Progress:__** {percent:.2f}%\n"
+        f"│ **__Uploaded:__** {current_mb:.2f} MB / {total_mb:.2f} MB\n"
+        f"╰──────────────────╯\n\n"
+        f"**__Powered by Team SPY__**"
+    )
 
-    if current_time - last_update_time >= 10 or percent % 10 == 0:
-        completed_blocks = int(percent // 10)
-        remaining_blocks = 10 - completed_blocks
-        progress_bar = "♦" * completed_blocks + "◇" * remaining_blocks
-        current_mb = current / (1024 * 1024)  
-        total_mb = total / (1024 * 1024)      
-        await progress_message.edit(
-    f"╭──────────────────╮\n"
-    f"│        **__Uploading...__**       \n"
-    f"├──────────\n"
-    f"│ {progress_bar}\n\n"
-    f"│ **__Progress:__** {percent:.2f}%\n"
-    f"│ **__Uploaded:__** {current_mb:.2f} MB / {total_mb:.2f} MB\n"
-    f"╰──────────────────╯\n\n"
-    f"**__Powered by Team SPY__**"
-        )
+async def progress_callback(current, total, progress_message):
+    progress_reporter(progress_message).submit(upload_progress_text(current, total))
 
-        last_update_time = current_time
 async def prog_bar(current, total, ud_type, message, start):
-
-    now = time.time()
-    diff = now - start
-    if round(diff % 10.00) == 0 or current == total:
-
-        percentage = current * 100 / total
-        speed = current / diff
-        elapsed_time = round(diff) * 1000
-        time_to_completion = round((total - current) / speed) * 1000
-        estimated_total_time = elapsed_time + time_to_completion
-
-        elapsed_time = TimeFormatter(milliseconds=elapsed_time)
-        estimated_total_time = TimeFormatter(milliseconds=estimated_total_time)
-
-        progress = "{0}{1}".format(
-            ''.join(["♦" for i in range(math.floor(percentage / 10))]),
-            ''.join(["◇" for i in range(10 - math.floor(percentage / 10))]))
-
-        tmp = progress + PROGRESS_BAR.format( 
-            round(percentage, 2),
-            humanbytes(current),
-            humanbytes(total),
-            humanbytes(speed),
-
-            estimated_total_time if estimated_total_time != '' else "0 s"
-        )
-        try:
-            await message.edit_text(
-                text="{}\n│ {}".format(ud_type, tmp),)             
-
-        except:
-            pass
+    progress_reporter(message).submit(render_progress(current, total, ud_type, start))
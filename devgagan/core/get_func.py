@@ -5,6 +5,7 @@
 import asyncio
 import time
 import gc
+import math
 import os
 import re
 from typing import Callable
@@ -13,32 +14,34 @@ import aiofiles
 from devgagan import sex as gf
 from telethon.tl.types import DocumentAttributeVideo, Message
 from telethon.sessions import StringSession
-import pymongo
 from pyrogram.types import InlineKeyboardMarkup, InlineKeyboardButton
-from pyrogram.errors import ChannelBanned, ChannelInvalid, ChannelPrivate, ChatIdInvalid, ChatInvalid
+from pyrogram.errors import ChannelBanned, ChannelInvalid, ChannelPrivate, ChatIdInvalid, ChatInvalid, FloodWait
 from pyrogram.enums import MessageMediaType, ParseMode
 from devgagan.core.func import *
 from pyrogram.errors import RPCError
 from pyrogram.types import Message
-from config import MONGO_DB as MONGODB_CONNECTION_STRING, LOG_GROUP, OWNER_ID, STRING, API_ID, API_HASH
+from config import LOG_GROUP, OWNER_ID, STRING, API_ID, API_HASH, PARALLEL_DOWNLOAD_CONNECTIONS
 from devgagan.core.mongo import db as odb
+from devgagan.core.mongo import settings_db
+from devgagan.core.userbot_pool import userbot_pool
+from devgagan.core.media_probe import probe_media
+from devgagan.core.parts import upload_file_parts, MAX_PART_SIZE
+from devgagan.core.parallel_download import parallel_download, DOWNLOAD_DIR
+from devgagan.core.journal import journal_path, has_journal, drop_journals, ResumableError
+from devgagan.core.file_cache import file_cache, media_cache_key
+from devgagan.core.mongo import cache_db
+from devgagan.core import scratch
 from telethon import TelegramClient, events, Button
 from devgagantools import fast_upload
 
 def thumbnail(sender):
     return f'{sender}.jpg' if os.path.exists(f'{sender}.jpg') else None
 
-# MongoDB database name and collection name
-DB_NAME = "smart_users"
-COLLECTION_NAME = "super_user"
+PARALLEL_DOWNLOAD_MIN_SIZE = 20 * 1024**2  # 20 MB
 
 VIDEO_EXTENSIONS = ['mp4', 'mov', 'avi', 'mkv', 'flv', 'wmv', 'webm', 'mpg', 'mpeg', '3gp', 'ts', 'm4v', 'f4v', 'vob']
 DOCUMENT_EXTENSIONS = ['pdf', 'docs']
 
-mongo_app = pymongo.MongoClient(MONGODB_CONNECTION_STRING)
-db = mongo_app[DB_NAME]
-collection = db[COLLECTION_NAME]
-
 if STRING:
     from devgagan import pro
     print("App imported from devgagan.")
@@ -46,10 +49,13 @@ else:
     pro = None
     print("STRING is not available. 'app' is set to None.")
 
+async def fetch_download_method(user_id):
+    """Fetch the user's preferred download method ("Pyrogram" or "Parallel")."""
+    return await settings_db.get_setting(user_id, "download_method", "Pyrogram")
+
 async def fetch_upload_method(user_id):
     """Fetch the user's preferred upload method."""
-    user_data = collection.find_one({"user_id": user_id})
-    return user_data.get("upload_method", "Pyrogram") if user_data else "Pyrogram"
+    return await settings_db.get_setting(user_id, "upload_method", "Pyrogram")
 
 async def format_caption_to_html(caption: str) -> str:
     caption = re.sub(r"^> (.*)", r"<blockquote>\1</blockquote>", caption, flags=re.MULTILINE)
@@ -67,11 +73,18 @@ async def format_caption_to_html(caption: str) -> str:
 # ---------------------- UPDATED UPLOAD MEDIA FUNCTION ----------------------
 # Extra parameter "as_document" (default False). If True, even video files will be sent as documents.
 async def upload_media(sender, target_chat_id, file, caption, edit, topic_id, as_document=False):
+    """Upload ``file``; returns the sent Pyrogram message (None for Telethon).
+
+    A failed upload is reported to LOG_GROUP and raised; a failed log copy after
+    the upload is only printed, so the caller never sends the file twice.
+    """
+    thumb_path = None
+    dm = None
     try:
         upload_method = await fetch_upload_method(sender)  # "Pyrogram" or "Telethon"
-        metadata = video_metadata(file)
+        metadata = await probe_media(file, sender)
         width, height, duration = metadata['width'], metadata['height'], metadata['duration']
-        thumb_path = await screenshot(file, duration, sender)
+        thumb_path = metadata['thumb']
         
         video_formats = {'mp4', 'mkv', 'avi', 'mov'}
         image_formats = {'jpg', 'png', 'jpeg'}
@@ -92,7 +105,7 @@ async def upload_media(sender, target_chat_id, file, caption, edit, topic_id, as
                     progress=progress_bar,
                     progress_args=("╭─────────────────────╮\n│      **__Pyro Uploader__**\n├─────────────────────", edit, time.time())
                 )
-                await dm.copy(LOG_GROUP)
+                await copy_to_log(dm)
             else:
                 dm = await app.send_document(
                     chat_id=target_chat_id,
@@ -105,7 +118,7 @@ async def upload_media(sender, target_chat_id, file, caption, edit, topic_id, as
                     progress_args=("╭─────────────────────╮\n│      **__Pyro Uploader__**\n├─────────────────────", edit, time.time())
                 )
                 await asyncio.sleep(2)
-                await dm.copy(LOG_GROUP)
+                await copy_to_log(dm)
                 
         # Telethon upload
         elif upload_method == "Telethon":
@@ -114,9 +127,9 @@ async def upload_media(sender, target_chat_id, file, caption, edit, topic_id, as
             caption = await format_caption_to_html(caption)
             uploaded = await fast_upload(
                 gf, file,
-                reply=progress_message,
+                reply=progress_reporter(progress_message),
                 name=None,
-                progress_bar_function=lambda done, total: progress_callback(done, total, sender)
+                progress_bar_function=upload_progress_text
             )
             await progress_message.delete()
             if (not as_document) and (file.split('.')[-1].lower() in video_formats):
@@ -138,30 +151,47 @@ async def upload_media(sender, target_chat_id, file, caption, edit, topic_id, as
                 reply_to=topic_id,
                 thumb=thumb_path
             )
-            await gf.send_file(
-                LOG_GROUP,
-                uploaded,
-                caption=caption,
-                attributes=attributes,
-                thumb=thumb_path
-            )
+            try:
+                await gf.send_file(
+                    LOG_GROUP,
+                    uploaded,
+                    caption=caption,
+                    attributes=attributes,
+                    thumb=thumb_path
+                )
+            except Exception as e:
+                print(f"Log copy failed: {e}")
 
     except Exception as e:
-        await app.send_message(LOG_GROUP, f"**Upload Failed:** {str(e)}")
         print(f"Error during media upload: {e}")
+        try:
+            await app.send_message(LOG_GROUP, f"**Upload Failed:** {str(e)}")
+        except Exception:
+            pass
+        raise
     finally:
         if thumb_path and os.path.exists(thumb_path):
             os.remove(thumb_path)
         gc.collect()
+    return dm
+
+async def wait_turn(turn):
+    """In a concurrent batch, hold delivery until all earlier messages are sent."""
+    if turn:
+        await turn.wait()
 
-async def get_msg(userbot, sender, edit_id, msg_link, i, message):
+async def get_msg(userbot, sender, edit_id, msg_link, i, message, turn=None):
     try:
         # Sanitize the message link
         msg_link = msg_link.split("?single")[0]
         chat, msg_id = None, None
-        saved_channel_ids = load_saved_channel_ids()
         file = ''
         edit = ''
+        delivered = False
+        retrying = False
+        file_name = None
+        job = None
+        expected_size = 0
         # Extract chat and message ID for valid Telegram links
         if 't.me/c/' in msg_link or 't.me/b/' in msg_link:
             parts = msg_link.split("/")
@@ -172,7 +202,7 @@ async def get_msg(userbot, sender, edit_id, msg_link, i, message):
                 chat = int('-100' + parts[parts.index('c') + 1])
                 msg_id = int(parts[-1]) + i
 
-            if chat in saved_channel_ids:
+            if settings_db.is_channel_locked(chat):
                 await app.edit_message_text(
                     message.chat.id, edit_id,
                     "Sorry! This channel is protected by **__Team SPY__**."
@@ -189,14 +219,18 @@ async def get_msg(userbot, sender, edit_id, msg_link, i, message):
             if chat.isdigit():   # for channel stories
                 chat = f"-100{chat}"
             msg_id = int(parts[-1])
+            await wait_turn(turn)
             await download_user_stories(userbot, chat, msg_id, edit, sender)
+            delivered = True
             await edit.delete(2)
             return
         else:
             edit = await app.edit_message_text(sender, edit_id, "Public link detected...")
             chat = msg_link.split("t.me/")[1].split("/")[0]
             msg_id = int(msg_link.split("/")[-1])
+            await wait_turn(turn)
             await copy_message_with_chat_id(app, userbot, sender, chat, msg_id, edit)
+            delivered = True
             await edit.delete(2)
             return
 
@@ -205,12 +239,14 @@ async def get_msg(userbot, sender, edit_id, msg_link, i, message):
         if not msg or msg.service or msg.empty:
             return
 
-        target_chat_id = user_chat_ids.get(message.chat.id, message.chat.id)
+        target_chat_id = await get_target_chat(message.chat.id)
         topic_id = None
         if '/' in str(target_chat_id):
             target_chat_id, topic_id = map(int, target_chat_id.split('/', 1))
 
         # Handle non-file messages
+        if msg.media == MessageMediaType.WEB_PAGE_PREVIEW or msg.text or msg.sticker:
+            await wait_turn(turn)
         if msg.media == MessageMediaType.WEB_PAGE_PREVIEW:
             await clone_message(app, msg, target_chat_id, topic_id, edit_id, LOG_GROUP)
             return
@@ -221,19 +257,41 @@ async def get_msg(userbot, sender, edit_id, msg_link, i, message):
             await handle_sticker(app, msg, target_chat_id, topic_id, edit_id, LOG_GROUP)
             return
 
+        # Unprotected media is copied by reference instead of downloading and re-uploading it,
+        # unless the user's settings would change the file
+        if not is_protected(msg) and await keeps_original_file(sender):
+            caption = await get_final_caption(msg, sender)
+            if await copy_by_reference(userbot, chat, msg_id, sender, target_chat_id, topic_id, caption, turn):
+                return
+
+        # A post the bot uploaded before is resent by its file_id without any transfer
+        # Only a hit waits for its turn; a miss goes straight on to download ahead
+        # File ids are shared across users, so only unmodified uploads are cached or reused
+        cache_key = media_cache_key(msg) if await keeps_original_file(sender) else None
+        cached_file_id = await cache_db.get_file_id(cache_key) if cache_key else None
+        if cached_file_id:
+            caption = await get_final_caption(msg, sender)
+            await wait_turn(turn)
+            if await send_cached_file(cache_key, cached_file_id, target_chat_id, topic_id, caption):
+                return
+
         # Handle file media (photo, document, video)
         file_size = get_message_file_size(msg)
         file_name = await get_media_filename(msg)
+        if turn:
+            await turn.reserve(file_size)
+        job = scratch.lease(sender, chat, msg_id, expected_size=file_size)
+        expected_size = file_size
         edit = await app.edit_message_text(sender, edit_id, "**Downloading...**")
-        file = await userbot.download_media(
-            msg,
-            file_name=file_name,
-            progress=progress_bar,
-            progress_args=("╭─────────────────────╮\n│      **__Downloading__...**\n├─────────────────────", edit, time.time())
-        )
+        download_start = time.time()
+        file = await download_message_media(userbot, msg, sender, file_name, file_size, edit, job)
+        if turn:
+            turn.record("download", file_size, time.time() - download_start)
 
         caption = await get_final_caption(msg, sender)
         file = await rename_file(file, sender)
+        await wait_turn(turn)
+        upload_start = time.time()
 
         # ------------- NEW FILE SIZE HANDLING -------------
         # Use 2GB threshold to split and 1GB threshold to force document upload.
@@ -246,91 +304,236 @@ async def get_msg(userbot, sender, edit_id, msg_link, i, message):
                 await edit.delete()
             except Exception:
                 pass
-            status_msg1 = await app.send_message(sender, f"Large file detected (> {file_size/(1024**3):.2f} GB). Splitting into 2GB chunks...")
-            status_msg2 = await app.send_message(sender, "Starting to split the file...")
-            # Call the provided split function from your solution code.
-            chunk_files = split_file(file)
-            total_chunks = len(chunk_files)
-            status_msg3 = await app.send_message(sender, f"File split into {total_chunks} chunk(s).")
-
-            for idx, chunk in enumerate(chunk_files):
-                try:
-                    chunk_status_msg = await app.send_message(sender, f"Uploading chunk {idx+1} of {total_chunks}...")
-                    progress_status = await app.send_message(sender, f"Uploading chunk {idx+1} of {total_chunks} ...")
-                    chunk_caption = caption + f"\n\nPart {idx+1} of {total_chunks}"
-
-                    devgaganin = await app.send_document(
-                        chat_id=target_chat_id,
-                        document=chunk,
-                        caption=chunk_caption,
-                        progress=progress_bar,
-                        progress_args=('**Uploading...**', progress_status, time.time())
-                    )
+            total_parts = math.ceil(file_size / MAX_PART_SIZE)
+            status_msg = await app.send_message(sender, f"Large file detected (> {file_size/(1024**3):.2f} GB). Uploading it as {total_parts} parts of up to 2GB...")
+            progress_status = await app.send_message(sender, "Uploading parts ...")
+            try:
+                parts = await upload_file_parts(
+                    app, target_chat_id, file, caption, topic_id,
+                    progress=progress_bar,
+                    progress_args=('**Uploading parts...**', progress_status, time.time()),
+                    journal=journal_path(file, "upload")
+                )
+                # A retry resumes the parts from the upload journal; nothing below may trigger one
+                delivered = True
+                for part in parts:
+                    if part is None:
+                        continue
                     if msg.pinned_message:
                         try:
-                            await devgaganin.pin(both_sides=True)
+                            await part.pin(both_sides=True)
                         except Exception:
-                            await devgaganin.pin()
-                    await devgaganin.copy(LOG_GROUP)
-                    await app.edit_message_text(sender, progress_status.id, f"Chunk {idx+1} of {total_chunks} uploaded successfully!")
-                    await asyncio.sleep(2)
-                    try:
-                        await app.delete_messages(sender, [chunk_status_msg.id, progress_status.id])
-                    except Exception:
-                        pass
-                except Exception as chunk_error:
-                    if "PEER_ID_INVALID" in str(chunk_error):
-                        pass
-                    else:
-                        await app.send_message(sender, f"Error uploading chunk {idx+1}: {chunk_error}")
-                finally:
-                    if os.path.exists(chunk):
-                        os.remove(chunk)
-
-            if os.path.exists(file):
-                os.remove(file)
-            await asyncio.sleep(2)
-            try:
-                await app.delete_messages(sender, [status_msg1.id, status_msg2.id, status_msg3.id])
-            except Exception:
-                pass
-            await app.send_message(sender, "All chunks uploaded successfully!")
-            return
+                            try:
+                                await part.pin()
+                            except Exception as e:
+                                print(f"Pinning part failed: {e}")
+                    await copy_to_log(part)
+                await app.send_message(sender, "All chunks uploaded successfully!")
+            except Exception as part_error:
+                if not delivered and "PEER_ID_INVALID" not in str(part_error):
+                    await app.send_message(sender, f"Error uploading parts: {part_error}")
+                raise
+            finally:
+                try:
+                    await app.delete_messages(sender, [status_msg.id, progress_status.id])
+                except Exception:
+                    pass
         elif file_size > DOCUMENT_THRESHOLD:
             # For files larger than 1GB (but not exceeding 2GB), force document upload to avoid video conversion.
-            await upload_media(sender, target_chat_id, file, caption, edit, topic_id, as_document=True)
-            return
+            sent = await upload_media(sender, target_chat_id, file, caption, edit, topic_id, as_document=True)
+            delivered = True
+            await remember_file_id(cache_key, sent)
         else:
-            await upload_media(sender, target_chat_id, file, caption, edit, topic_id)
+            sent = await upload_media(sender, target_chat_id, file, caption, edit, topic_id)
+            delivered = True
+            await remember_file_id(cache_key, sent)
+        if turn:
+            turn.record("upload", file_size, time.time() - upload_start)
         # ------------- END FILE SIZE HANDLING -------------
 
+    # In a batch (``turn`` set) every failure before delivery is raised, so run_batch
+    # can retry it or list it as skipped. Once the item reached the target chat
+    # nothing is raised: a retry would deliver it a second time.
     except (ChannelBanned, ChannelInvalid, ChannelPrivate, ChatIdInvalid, ChatInvalid):
         await app.edit_message_text(sender, edit_id, "Have you joined the channel?")
+        if turn:
+            raise
+    except scratch.NoSpace:
+        await app.edit_message_text(sender, edit_id, "⚠️ Not enough free disk space right now. Please try again in a few minutes.")
+        if turn:
+            raise
+    except FloodWait as fw:
+        if delivered:
+            print(f"FloodWait after delivery: {fw}")
+        else:
+            retrying = bool(turn)
+            raise
     except Exception as e:
         print(f"Error: {e}")
+        if turn and not delivered:
+            # Batches retry an interrupted transfer; it picks up from the journal left on disk
+            if job and has_journal(file or download_path(file_name, job)):
+                retrying = True
+                raise ResumableError(str(e)) from e
+            raise
     finally:
-        if file and os.path.exists(file):
-            os.remove(file)
-        if edit:
+        if file and (delivered or not has_journal(file)):
+            discard_file(file)
+        if job:
+            scratch.release(job, expected_size, keep=not delivered and has_journal(file or download_path(file_name, job)))
+        # A batch retry reuses the status message, so it stays until the item is settled
+        if edit and not retrying:
             await edit.delete(2)
 
+# Per-chat cache of whether the bot itself can read a chat: {chat: (readable, checked_at)}
+bot_read_access = {}
+ACCESS_PROBE_TTL = 600
+
+def is_protected(msg):
+    return bool(msg.has_protected_content or (msg.chat and msg.chat.has_protected_content))
+
+async def keeps_original_file(sender):
+    """Whether the user's uploads carry the source file unchanged.
+
+    A custom thumbnail, rename tag or delete/replace words change the file a
+    download-and-upload produces, so those users cannot be served by reference.
+    """
+    if thumbnail(sender) or await load_user_data(sender, "rename_tag") is not None:
+        return False
+    return not await load_delete_words(sender) and not await load_replacement_words(sender)
+
+async def copy_to_log(result):
+    """Copy a delivered message to LOG_GROUP; a failure here never affects delivery."""
+    try:
+        await result.copy(LOG_GROUP)
+    except Exception as e:
+        print(f"Log copy failed: {e}")
+
+async def probe_bot_access(chat, msg_id):
+    """Whether the bot itself can read ``chat``; both answers are cached per chat."""
+    cached = bot_read_access.get(chat)
+    if cached and time.time() - cached[1] < ACCESS_PROBE_TTL:
+        return cached[0]
+    try:
+        bot_msg = await app.get_messages(chat, msg_id)
+        readable = bool(bot_msg and not bot_msg.empty)
+    except Exception:
+        readable = False
+    bot_read_access[chat] = (readable, time.time())
+    return readable
+
+async def copy_by_reference(userbot, chat, msg_id, sender, target_chat_id, topic_id, caption, turn=None):
+    """Deliver a post with a single RPC when the source allows it. Returns True on success.
+
+    The access probe runs before the batch turn is awaited, so an item that has to
+    be downloaded after all starts without waiting for the items before it.
+    """
+    readable = await probe_bot_access(chat, msg_id)
+    # The userbot can only post into chats the user chose with /settings, not into the bot's DM
+    if not readable and target_chat_id == sender:
+        return False
+    await wait_turn(turn)
+    if readable:
+        try:
+            result = await app.copy_message(target_chat_id, chat, msg_id, caption=caption, reply_to_message_id=topic_id)
+        except Exception as e:
+            print(f"Bot-side copy failed, falling back to download: {e}")
+        else:
+            await copy_to_log(result)
+            return True
+    if target_chat_id != sender:
+        try:
+            await userbot.copy_message(target_chat_id, chat, msg_id, caption=caption, reply_to_message_id=topic_id)
+            return True
+        except Exception as e:
+            print(f"Userbot copy failed, falling back to download: {e}")
+    return False
+
+async def send_cached_file(cache_key, file_id, target_chat_id, topic_id, caption):
+    """Resend the bot's own upload of a post by its cached ``file_id``. Returns True on success."""
+    try:
+        result = await app.send_cached_media(target_chat_id, file_id, caption=caption, reply_to_message_id=topic_id)
+    except Exception as e:
+        print(f"Cached file_id failed, transferring again: {e}")
+        await cache_db.forget_file_id(cache_key)
+        return False
+    await copy_to_log(result)
+    return True
+
+async def remember_file_id(cache_key, sent):
+    """Keep the file_id of a fresh upload; get_msg passes no key for modified uploads."""
+    if not cache_key or not sent or not sent.media:
+        return
+    media = getattr(sent, sent.media.value, None)
+    if media and getattr(media, "file_id", None):
+        await cache_db.save_file_id(cache_key, media.file_id)
+
 async def clone_message(app, msg, target_chat_id, topic_id, edit_id, log_group):
     edit = await app.edit_message_text(target_chat_id, edit_id, "Cloning...")
     devgaganin = await app.send_message(target_chat_id, msg.text.markdown, reply_to_message_id=topic_id)
-    await devgaganin.copy(LOG_GROUP)
-    await edit.delete()
+    await copy_to_log(devgaganin)
+    # Delivered already: a failure from here on must not make the batch send it again
+    try:
+        await edit.delete()
+    except Exception:
+        pass
 
 async def clone_text_message(app, msg, target_chat_id, topic_id, edit_id, log_group):
     edit = await app.edit_message_text(target_chat_id, edit_id, "Cloning text message...")
     devgaganin = await app.send_message(target_chat_id, msg.text.markdown, reply_to_message_id=topic_id)
-    await devgaganin.copy(LOG_GROUP)
-    await edit.delete()
+    await copy_to_log(devgaganin)
+    try:
+        await edit.delete()
+    except Exception:
+        pass
 
 async def handle_sticker(app, msg, target_chat_id, topic_id, edit_id, log_group):
     edit = await app.edit_message_text(target_chat_id, edit_id, "Handling sticker...")
     result = await app.send_sticker(target_chat_id, msg.sticker.file_id, reply_to_message_id=topic_id)
-    await result.copy(LOG_GROUP)
-    await edit.delete()
+    await copy_to_log(result)
+    try:
+        await edit.delete()
+    except Exception:
+        pass
+
+def download_path(file_name, directory=DOWNLOAD_DIR):
+    return os.path.join(directory, os.path.basename(file_name or ""))
+
+def discard_file(file):
+    """Remove a transferred file together with its resume journals."""
+    if os.path.exists(file):
+        os.remove(file)
+    drop_journals(file)
+
+async def download_message_media(userbot, msg, sender, file_name, file_size, edit, directory=DOWNLOAD_DIR):
+    """Download with the user's chosen method; small files always use one stream.
+
+    Larger files go through the segmented downloader (one stream unless the user
+    picked "Parallel"), which journals finished segments so a retry resumes.
+    """
+    cache_key = media_cache_key(msg)
+    cached = file_cache.get(cache_key, download_path(file_name, directory))
+    if cached:
+        return cached
+    progress_args = ("╭─────────────────────╮\n│      **__Downloading__...**\n├─────────────────────", edit, time.time())
+    if file_size > PARALLEL_DOWNLOAD_MIN_SIZE:
+        parallel = await fetch_download_method(sender) == "Parallel"
+        file = await parallel_download(
+            userbot, msg, file_name, file_size,
+            connections=PARALLEL_DOWNLOAD_CONNECTIONS if parallel else 1,
+            progress=progress_bar,
+            progress_args=progress_args,
+            directory=directory
+        )
+    else:
+        file = await userbot.download_media(
+            msg,
+            file_name=os.path.abspath(download_path(file_name, directory)),
+            progress=progress_bar,
+            progress_args=progress_args
+        )
+    file_cache.put(cache_key, file)
+    return file
 
 async def get_media_filename(msg):
     if msg.document:
@@ -356,9 +559,9 @@ async def get_final_caption(msg, sender):
     else:
         original_caption = ""
     
-    custom_caption = get_user_caption_preference(sender)
+    custom_caption = await get_user_caption_preference(sender)
     final_caption = f"{original_caption}\n\n{custom_caption}" if custom_caption else original_caption
-    replacements = load_replacement_words(sender)
+    replacements = await load_replacement_words(sender)
     for word, replace_word in replacements.items():
         final_caption = final_caption.replace(word, replace_word)
         
@@ -392,13 +595,15 @@ async def download_user_stories(userbot, chat_id, msg_id, edit, sender):
         await edit.edit(f"Error: {e}")
 
 async def copy_message_with_chat_id(app, userbot, sender, chat_id, message_id, edit):
-    target_chat_id = user_chat_ids.get(sender, sender)
+    target_chat_id = await get_target_chat(sender)
     file = None
     result = None
+    job = None
+    expected_size = 0
     try:
         msg = await app.get_messages(chat_id, message_id)
-        custom_caption = get_user_caption_preference(sender)
-        final_caption = format_caption(msg.caption or '', sender, custom_caption)
+        custom_caption = await get_user_caption_preference(sender)
+        final_caption = await format_caption(msg.caption or '', sender, custom_caption)
         topic_id = None
         if '/' in str(target_chat_id):
             target_chat_id, topic_id = map(int, target_chat_id.split('/', 1))
@@ -417,23 +622,17 @@ async def copy_message_with_chat_id(app, userbot, sender, chat_id, message_id, e
             if msg.text:
                 await app.send_message(target_chat_id, msg.text.markdown, reply_to_message_id=topic_id)
                 return
-            final_caption = format_caption(msg.caption.markdown if msg.caption else "", sender, custom_caption)
-            file = await userbot.download_media(
-                msg,
-                progress=progress_bar,
-                progress_args=("╭─────────────────────╮\n│      **__Downloading__...**\n├─────────────────────", edit, time.time())
-            )
+            final_caption = await format_caption(msg.caption.markdown if msg.caption else "", sender, custom_caption)
+            expected_size = get_message_file_size(msg) or 0
+            job = scratch.lease(sender, chat_id, message_id, expected_size=expected_size)
+            file = await download_message_media(userbot, msg, sender, await get_media_filename(msg), expected_size, edit, job)
             file = await rename_file(file, sender)
             if msg.photo:
                 result = await app.send_photo(target_chat_id, file, caption=final_caption, reply_to_message_id=topic_id)
             elif msg.video or msg.document:
-                freecheck = await chk_user(chat_id, sender)
-                if file_size > 2 * 1024 * 1024 * 1024 and (freecheck == 1 or pro is None):
+                if os.path.getsize(file) > 2 * 1024 * 1024 * 1024:
                     await edit.delete()
-                    await split_and_upload_file(app, sender, target_chat_id, file, caption, topic_id)
-                    return       
-                elif file_size > 2 * 1024 * 1024 * 1024:
-                    await handle_large_file(file, sender, edit, final_caption)
+                    await upload_file_parts(app, target_chat_id, file, final_caption, topic_id)
                     return
                 await upload_media(sender, target_chat_id, file, final_caption, edit, topic_id)
             elif msg.audio:
@@ -444,11 +643,17 @@ async def copy_message_with_chat_id(app, userbot, sender, chat_id, message_id, e
                 result = await app.send_sticker(target_chat_id, msg.sticker.file_id, reply_to_message_id=topic_id)
             else:
                 await edit.edit("Unsupported media type.")
+    except scratch.NoSpace:
+        await edit.edit("⚠️ Not enough free disk space right now. Please try again in a few minutes.")
+        raise
     except Exception as e:
         print(f"Error : {e}")
+        raise
     finally:
-        if file and os.path.exists(file):
-            os.remove(file)
+        if file:
+            discard_file(file)
+        if job:
+            scratch.release(job, expected_size)
 
 async def send_media_message(app, target_chat_id, msg, caption, topic_id):
     try:
@@ -462,9 +667,9 @@ async def send_media_message(app, target_chat_id, msg, caption, topic_id):
         print(f"Error while sending media: {e}")
     return await app.copy_message(target_chat_id, msg.chat.id, msg.id, reply_to_message_id=topic_id)
 
-def format_caption(original_caption, sender, custom_caption):
-    delete_words = load_delete_words(sender)
-    replacements = load_replacement_words(sender)
+async def format_caption(original_caption, sender, custom_caption):
+    delete_words = await load_delete_words(sender)
+    replacements = await load_replacement_words(sender)
     for word in delete_words:
         original_caption = original_caption.replace(word, '  ')
     for word, replace_word in replacements.items():
@@ -477,62 +682,72 @@ def format_caption(original_caption, sender, custom_caption):
 
 # ------------------------ Button Mode Editz FOR SETTINGS ----------------------------
 
-# Define a dictionary to store user chat IDs
-user_chat_ids = {}
+async def load_user_data(user_id, key, default_value=None):
+    return await settings_db.get_setting(user_id, key, default_value)
 
-def load_user_data(user_id, key, default_value=None):
-    try:
-        user_data = collection.find_one({"_id": user_id})
-        return user_data.get(key, default_value) if user_data else default_value
-    except Exception as e:
-        print(f"Error loading {key}: {e}")
-        return default_value
+async def save_user_data(user_id, key, value):
+    await settings_db.set_setting(user_id, key, value)
 
-def load_saved_channel_ids():
-    saved_channel_ids = set()
-    try:
-        # Retrieve channel IDs from MongoDB collection
-        for channel_doc in collection.find({"channel_id": {"$exists": True}}):
-            saved_channel_ids.add(channel_doc["channel_id"])
-    except Exception as e:
-        print(f"Error loading saved channel IDs: {e}")
-    return saved_channel_ids
+# Delete and replacement word functions
+async def load_delete_words(user_id):
+    return set(await load_user_data(user_id, "delete_words", []))
 
-def save_user_data(user_id, key, value):
-    try:
-        collection.update_one(
-            {"_id": user_id},
-            {"$set": {key: value}},
-            upsert=True
-        )
-    except Exception as e:
-        print(f"Error saving {key}: {e}")
+async def save_delete_words(user_id, words):
+    await save_user_data(user_id, "delete_words", list(words))
 
-# Delete and replacement word functions
-load_delete_words = lambda user_id: set(load_user_data(user_id, "delete_words", []))
-save_delete_words = lambda user_id, words: save_user_data(user_id, "delete_words", list(words))
+async def load_replacement_words(user_id):
+    return dict(await load_user_data(user_id, "replacement_words", {}))
 
-load_replacement_words = lambda user_id: load_user_data(user_id, "replacement_words", {})
-save_replacement_words = lambda user_id, replacements: save_user_data(user_id, "replacement_words", replacements)
+async def save_replacement_words(user_id, replacements):
+    await save_user_data(user_id, "replacement_words", replacements)
 
 # Upload preference functions
-set_dupload = lambda user_id, value: save_user_data(user_id, "dupload", value)
-get_dupload = lambda user_id: load_user_data(user_id, "dupload", False)
+async def set_dupload(user_id, value):
+    await save_user_data(user_id, "dupload", value)
 
-# User preferences storage
-user_rename_preferences = {}
-user_caption_preferences = {}
+async def get_dupload(user_id):
+    return await load_user_data(user_id, "dupload", False)
+
+# Target chat, rename tag and caption live in the settings document, so every
+# process (front-end or transfer worker) sees the same values
+async def get_target_chat(user_id):
+    return await load_user_data(user_id, "chat_id", user_id)
+
+async def set_target_chat(user_id, chat_id):
+    await save_user_data(user_id, "chat_id", chat_id)
 
-# Rename and caption preference functions
 async def set_rename_command(user_id, custom_rename_tag):
-    user_rename_preferences[str(user_id)] = custom_rename_tag
+    await save_user_data(user_id, "rename_tag", custom_rename_tag)
 
-get_user_rename_preference = lambda user_id: user_rename_preferences.get(str(user_id), 'Team SPY')
+async def get_user_rename_preference(user_id):
+    return await load_user_data(user_id, "rename_tag", 'Team SPY')
 
 async def set_caption_command(user_id, custom_caption):
-    user_caption_preferences[str(user_id)] = custom_caption
-
-get_user_caption_preference = lambda user_id: user_caption_preferences.get(str(user_id), '')
+    await save_user_data(user_id, "caption", custom_caption)
+
+async def get_user_caption_preference(user_id):
+    return await load_user_data(user_id, "caption", '')
+
+# Custom thumbnails are kept in the settings document too; {user_id}.jpg is the working copy
+async def settings_snapshot(user_id):
+    """The settings a batch job carries to the process that runs it, thumbnail included."""
+    settings = dict(await settings_db.get_settings(user_id))
+    settings.setdefault("chat_id", user_id)
+    path = thumbnail(user_id)
+    if path:
+        with open(path, 'rb') as f:
+            settings["thumbnail"] = f.read()
+    return settings
+
+def apply_settings_snapshot(user_id, settings):
+    """Use a job's settings snapshot in this process and write its thumbnail file."""
+    settings_db.prime(user_id, settings)
+    path = f'{user_id}.jpg'
+    if settings.get("thumbnail"):
+        with open(path, 'wb') as f:
+            f.write(settings["thumbnail"])
+    elif os.path.exists(path):
+        os.remove(path)
 
 # Initialize sessions dictionary
 sessions = {}
@@ -553,7 +768,7 @@ async def send_settings_message(chat_id, user_id):
         [Button.inline("Session Login", b'addsession'), Button.inline("Logout", b'logout')],
         [Button.inline("Set Thumbnail", b'setthumb'), Button.inline("Remove Thumbnail", b'remthumb')],
         [Button.inline("PDF Wtmrk", b'pdfwt'), Button.inline("Video Wtmrk", b'watermark')],
-        [Button.inline("Upload Method", b'uploadmethod')],  # Dynamic upload method button
+        [Button.inline("Upload Method", b'uploadmethod'), Button.inline("Download Method", b'downloadmethod')],  # Dynamic method buttons
         [Button.url("Report Errors", "https://t.me/team_spy_pro")]
     ]
     await gf.send_file(
@@ -589,6 +804,7 @@ async def callback_query_handler(event):
         sessions[user_id] = 'deleteword'
     elif event.data == b'logout':
         await odb.remove_session(user_id)
+        await userbot_pool.discard(user_id)
         user_data = await odb.get_data(user_id)
         if user_data and user_data.get("session") is None:
             await event.respond("Logged out and deleted session successfully.")
@@ -601,8 +817,7 @@ async def callback_query_handler(event):
         await event.respond("Watermark is Pro+ Plan.. contact @kingofpatal")
         return
     elif event.data == b'uploadmethod':
-        user_data = collection.find_one({'user_id': user_id})
-        current_method = user_data.get('upload_method', 'Pyrogram') if user_data else 'Pyrogram'
+        current_method = await fetch_upload_method(user_id)
         pyrogram_check = " ✅" if current_method == "Pyrogram" else ""
         telethon_check = " ✅" if current_method == "Telethon" else ""
         buttons = [
@@ -611,35 +826,32 @@ async def callback_query_handler(event):
         ]
         await event.edit("Choose your preferred upload method:\n\n__**Note:** **SpyLib ⚡**, built on Telethon (base), by Team SPY is still in beta.__", buttons=buttons)
     elif event.data == b'pyrogram':
-        save_user_upload_method(user_id, "Pyrogram")
+        await save_user_upload_method(user_id, "Pyrogram")
         await event.edit("Upload method set to **Pyrogram** ✅")
     elif event.data == b'telethon':
-        save_user_upload_method(user_id, "Telethon")
+        await save_user_upload_method(user_id, "Telethon")
         await event.edit("Upload method set to **SpyLib ⚡\n\nThanks for choosing this library.** ✅")
+    elif event.data == b'downloadmethod':
+        current_method = await fetch_download_method(user_id)
+        single_check = " ✅" if current_method == "Pyrogram" else ""
+        parallel_check = " ✅" if current_method == "Parallel" else ""
+        buttons = [
+            [Button.inline(f"Pyrogram v2{single_check}", b'dlpyrogram')],
+            [Button.inline(f"Parallel ⚡{parallel_check}", b'dlparallel')]
+        ]
+        await event.edit("Choose your preferred download method:\n\n__**Note:** **Parallel ⚡** fetches several parts of large files at once.__", buttons=buttons)
+    elif event.data == b'dlpyrogram':
+        await save_user_data(user_id, "download_method", "Pyrogram")
+        await event.edit("Download method set to **Pyrogram** ✅")
+    elif event.data == b'dlparallel':
+        await save_user_data(user_id, "download_method", "Parallel")
+        await event.edit("Download method set to **Parallel ⚡** ✅")
     elif event.data == b'reset':
         try:
-            user_id_str = str(user_id)
-            collection.update_one(
-                {"_id": user_id},
-                {"$unset": {
-                    "delete_words": "",
-                    "replacement_words": "",
-                    "watermark_text": "",
-                    "duration_limit": ""
-                }}
-            )
-            collection.update_one(
-                {"user_id": user_id},
-                {"$unset": {
-                    "delete_words": "",
-                    "replacement_words": "",
-                    "watermark_text": "",
-                    "duration_limit": ""
-                }}
+            await settings_db.reset_settings(
+                user_id, ["delete_words", "replacement_words", "watermark_text", "duration_limit",
+                          "chat_id", "rename_tag", "caption", "thumbnail"]
             )
-            user_chat_ids.pop(user_id, None)
-            user_rename_preferences.pop(user_id_str, None)
-            user_caption_preferences.pop(user_id_str, None)
             thumbnail_path = f"{user_id}.jpg"
             if os.path.exists(thumbnail_path):
                 os.remove(thumbnail_path)
@@ -648,6 +860,7 @@ async def callback_query_handler(event):
             await event.respond(f"Error clearing delete list: {e}")
     elif event.data == b'remthumb':
         try:
+            await settings_db.reset_settings(user_id, ["thumbnail"])
             os.remove(f'{user_id}.jpg')
             await event.respond('Thumbnail removed successfully!')
         except FileNotFoundError:
@@ -661,17 +874,15 @@ async def save_thumbnail(event):
         if os.path.exists(f'{user_id}.jpg'):
             os.remove(f'{user_id}.jpg')
         os.rename(temp_path, f'./{user_id}.jpg')
+        with open(f'{user_id}.jpg', 'rb') as f:
+            await save_user_data(user_id, "thumbnail", f.read())
         await event.respond('Thumbnail saved successfully!')
     else:
         await event.respond('Please send a photo... Retry')
     pending_photos.pop(user_id, None)
 
-def save_user_upload_method(user_id, method):
-    collection.update_one(
-        {'user_id': user_id},
-        {'$set': {'upload_method': method}},
-        upsert=True
-    )
+async def save_user_upload_method(user_id, method):
+    await settings_db.set_upload_method(user_id, method)
 
 @gf.on(events.NewMessage)
 async def handle_user_input(event):
@@ -681,7 +892,7 @@ async def handle_user_input(event):
         if session_type == 'setchat':
             try:
                 chat_id = int(event.text)
-                user_chat_ids[user_id] = chat_id
+                await set_target_chat(user_id, chat_id)
                 await event.respond("Chat ID set successfully!")
             except ValueError:
                 await event.respond("Invalid chat ID!")
@@ -699,13 +910,13 @@ async def handle_user_input(event):
                 await event.respond("Usage: 'WORD(s)' 'REPLACEWORD'")
             else:
                 word, replace_word = match.groups()
-                delete_words = load_delete_words(user_id)
+                delete_words = await load_delete_words(user_id)
                 if word in delete_words:
                     await event.respond(f"The word '{word}' is in the delete set and cannot be replaced.")
                 else:
-                    replacements = load_replacement_words(user_id)
+                    replacements = await load_replacement_words(user_id)
                     replacements[word] = replace_word
-                    save_replacement_words(user_id, replacements)
+                    await save_replacement_words(user_id, replacements)
                     await event.respond(f"Replacement saved: '{word}' will be replaced with '{replace_word}'")
         elif session_type == 'addsession':
             session_string = event.text
@@ -713,9 +924,9 @@ async def handle_user_input(event):
             await event.respond("✅ Session string added successfully!")
         elif session_type == 'deleteword':
             words_to_delete = event.message.text.split()
-            delete_words = load_delete_words(user_id)
+            delete_words = await load_delete_words(user_id)
             delete_words.update(words_to_delete)
-            save_delete_words(user_id, delete_words)
+            await save_delete_words(user_id, delete_words)
             await event.respond(f"Words added to delete list: {', '.join(words_to_delete)}")
         del sessions[user_id]
 
@@ -728,41 +939,9 @@ async def lock_command_handler(event):
     except (ValueError, IndexError):
         return await event.respond("Invalid /lock command. Use /lock CHANNEL_ID.")
     try:
-        collection.insert_one({"channel_id": channel_id})
+        await settings_db.lock_channel(channel_id)
         await event.respond(f"Channel ID {channel_id} locked successfully.")
     except Exception as e:
         await event.respond(f"Error occurred while locking channel ID: {str(e)}")
 
-####################################
-#       NEW SPLIT FUNCTION         #
-####################################
-# Maximum chunk size set to 2000 MiB (~2GB per chunk)
-MAX_CHUNK_SIZE = 2000 * 1024**2
-
-def split_file(file_path, chunk_size=MAX_CHUNK_SIZE):
-    """
-    Splits the file at file_path into chunks of size chunk_size.
-    Reads the file in 64KB blocks to avoid loading the entire chunk in memory.
-    Returns a list of chunk file paths.
-    """
-    chunk_files = []
-    chunk_number = 1
-    buffer_size = 64 * 1024  # 64 KB
-    with open(file_path, "rb") as f:
-        while True:
-            bytes_written = 0
-            chunk_filename = f"{file_path}.part{chunk_number}"
-            with open(chunk_filename, "wb") as chunk_file:
-                while bytes_written < chunk_size:
-                    data = f.read(min(buffer_size, chunk_size - bytes_written))
-                    if not data:
-                        break
-                    chunk_file.write(data)
-                    bytes_written += len(data)
-            if bytes_written == 0:
-                break
-            chunk_files.append(chunk_filename)
-            chunk_number += 1
-    return chunk_files
-
 # (All other code such as additional settings, callbacks, or user session management remains unchanged.)
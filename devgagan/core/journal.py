@@ -0,0 +1,54 @@
+# ---------------------------------------------------
+# File Name: journal.py
+# Description: A Pyrogram bot for downloading files from Telegram channels or groups
+#              and uploading them back to Telegram.
+# Author: Gagan
+# GitHub: https://github.com/devgaganin/
+# Telegram: https://t.me/team_spy_pro
+# YouTube: https://youtube.com/@dev_gagan
+# Created: 2025-01-11
+# Last Modified: 2025-01-11
+# Version: 2.0.5
+# License: MIT License
+# ---------------------------------------------------
+
+import json
+import os
+
+# Sidecar journals record which parts of a transfer already finished, next to the
+# file itself: "<file>.download.json" and "<file>.upload.json".
+JOURNAL_KINDS = ("download", "upload")
+
+
+class ResumableError(Exception):
+    """A transfer failed but left a journal behind, so retrying it resumes the work."""
+
+
+def journal_path(file_path, kind):
+    return f"{file_path}.{kind}.json"
+
+
+def load_journal(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_journal(path, data):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+def has_journal(file_path):
+    return any(os.path.exists(journal_path(file_path, kind)) for kind in JOURNAL_KINDS)
+
+
+def drop_journals(file_path):
+    for kind in JOURNAL_KINDS:
+        path = journal_path(file_path, kind)
+        if os.path.exists(path):
+            os.remove(path)
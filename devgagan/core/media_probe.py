@@ -0,0 +1,156 @@
+# ---------------------------------------------------
+# File Name: media_probe.py
+# Description: A Pyrogram bot for downloading files from Telegram channels or groups
+#              and uploading them back to Telegram.
+# Author: Gagan
+# GitHub: https://github.com/devgaganin/
+# Telegram: https://t.me/team_spy_pro
+# YouTube: https://youtube.com/@dev_gagan
+# Created: 2025-01-11
+# Last Modified: 2025-01-11
+# Version: 2.0.5
+# License: MIT License
+# ---------------------------------------------------
+
+import asyncio
+import json
+import os
+import struct
+import uuid
+from collections import OrderedDict
+from config import MEDIA_PROBE_WORKERS
+from devgagan.core.func import video_metadata, hhmmss
+
+DEFAULT_METADATA = {'width': 1, 'height': 1, 'duration': 1, 'codec': None}
+CACHE_SIZE = 256
+
+# Caps how many ffprobe/ffmpeg processes run at once across all users
+_probe_slots = asyncio.Semaphore(MEDIA_PROBE_WORKERS)
+# (path, size, mtime) -> {'width', 'height', 'duration', 'codec', 'thumb'}
+_probe_cache = OrderedDict()
+
+
+async def _run(*cmd):
+    process = await asyncio.create_subprocess_exec(
+        *cmd,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE
+    )
+    stdout, _ = await process.communicate()
+    return process.returncode, stdout
+
+
+async def _ffprobe(file):
+    """Width, height, duration and codec of the first video stream from one ffprobe call."""
+    try:
+        code, out = await _run(
+            "ffprobe", "-v", "error",
+            "-select_streams", "v:0",
+            "-show_entries", "stream=width,height,codec_name,duration:format=duration",
+            "-of", "json",
+            file
+        )
+    except FileNotFoundError:
+        code, out = 1, b""
+    if code != 0:
+        # ffprobe missing or unable to parse: fall back to OpenCV off the event loop
+        metadata = await asyncio.to_thread(video_metadata, file)
+        return {**DEFAULT_METADATA, **metadata}
+    info = json.loads(out or b"{}")
+    stream = (info.get("streams") or [{}])[0]
+    duration = stream.get("duration") or info.get("format", {}).get("duration") or 0
+    return {
+        'width': stream.get("width") or 1,
+        'height': stream.get("height") or 1,
+        'duration': round(float(duration)) or 1,
+        'codec': stream.get("codec_name"),
+    }
+
+
+async def _thumbnail(file, duration):
+    # Next to the video, so the job's scratch folder takes it along when removed
+    out = os.path.join(os.path.dirname(os.path.abspath(file)), f"thumb_{uuid.uuid4().hex}.jpg")
+    try:
+        await _run("ffmpeg", "-ss", hhmmss(int(duration) / 2), "-i", file, "-frames:v", "1", out, "-y")
+    except FileNotFoundError:
+        return None
+    return out if os.path.isfile(out) else None
+
+
+def _moov_first(file):
+    """Whether the MP4 index (moov) comes before the media data (mdat)."""
+    with open(file, "rb") as f:
+        while True:
+            header = f.read(8)
+            if len(header) < 8:
+                return True
+            size, kind = struct.unpack(">I4s", header)
+            if kind == b"moov":
+                return True
+            if kind == b"mdat":
+                return False
+            if size == 1:
+                size = struct.unpack(">Q", f.read(8))[0] - 8
+            elif size == 0:
+                return True
+            f.seek(size - 8, os.SEEK_CUR)
+
+
+async def faststart(file):
+    """Move the MP4 index in front of the media by stream copy, so Telegram can play it while loading.
+
+    Files that already start with their index are left alone. Returns True when
+    the file was rewritten.
+    """
+    try:
+        if await asyncio.to_thread(_moov_first, file):
+            return False
+    except (OSError, struct.error):
+        return False
+    out = f"{file}.faststart.mp4"
+    async with _probe_slots:
+        try:
+            code, _ = await _run("ffmpeg", "-v", "error", "-i", file, "-map", "0", "-c", "copy",
+                                 "-movflags", "+faststart", out, "-y")
+        except FileNotFoundError:
+            return False
+    if code != 0 or not os.path.isfile(out):
+        if os.path.exists(out):
+            os.remove(out)
+        return False
+    os.replace(out, file)
+    return True
+
+
+async def probe_media(file, sender=None, thumbnail=True):
+    """Probe ``file`` and (optionally) grab a mid-point thumbnail under one worker slot.
+
+    The probe and the thumbnail are still two processes, since ffmpeg has to know
+    the duration before it can seek to the middle, but they run back to back in a
+    single acquisition of the probe cap. A user's custom ``{sender}.jpg``
+    thumbnail wins over the generated one. Results are cached by path, size and
+    mtime so retries of the same file skip both steps.
+    """
+    try:
+        stat = os.stat(file)
+    except OSError:
+        return {**DEFAULT_METADATA, 'thumb': None}
+    key = (os.path.abspath(file), stat.st_size, stat.st_mtime)
+    result = _probe_cache.get(key)
+    custom = sender is not None and os.path.exists(f'{sender}.jpg')
+    needs_thumb = thumbnail and not custom and not (result and result['thumb'] and os.path.exists(result['thumb']))
+
+    if result is None or needs_thumb:
+        async with _probe_slots:
+            if result is None:
+                result = {**await _ffprobe(file), 'thumb': None}
+                _probe_cache[key] = result
+                while len(_probe_cache) > CACHE_SIZE:
+                    _probe_cache.popitem(last=False)
+            if needs_thumb:
+                result['thumb'] = await _thumbnail(file, result['duration'])
+    _probe_cache.move_to_end(key)
+
+    if custom:
+        return {**result, 'thumb': f'{sender}.jpg'}
+    return dict(result)
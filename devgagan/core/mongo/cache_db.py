@@ -0,0 +1,46 @@
+# ---------------------------------------------------
+# File Name: cache_db.py
+# Description: A Pyrogram bot for downloading files from Telegram channels or groups
+#              and uploading them back to Telegram.
+# Author: Gagan
+# GitHub: https://github.com/devgaganin/
+# Telegram: https://t.me/team_spy_pro
+# YouTube: https://youtube.com/@dev_gagan
+# Created: 2025-01-11
+# Last Modified: 2025-01-11
+# Version: 2.0.5
+# License: MIT License
+# ---------------------------------------------------
+
+import datetime
+from devgagan.core.mongo.client import file_ids as db
+
+# Bot-side file ids are dropped after this long so stale references age out
+FILE_ID_TTL = 30 * 86400
+
+
+def _id(key):
+    chat, msg_id, unique_id = key
+    return f"{chat}:{msg_id}:{unique_id}"
+
+
+async def create_file_id_index():
+    await db.create_index("created_at", expireAfterSeconds=FILE_ID_TTL)
+
+
+async def get_file_id(key):
+    """The bot's own ``file_id`` for a (chat, msg_id, file_unique_id) source post, or None."""
+    doc = await db.find_one({"_id": _id(key)}, {"file_id": 1})
+    return doc["file_id"] if doc else None
+
+
+async def save_file_id(key, file_id):
+    await db.update_one(
+        {"_id": _id(key)},
+        {"$set": {"file_id": file_id, "created_at": datetime.datetime.utcnow()}},
+        upsert=True
+    )
+
+
+async def forget_file_id(key):
+    await db.delete_one({"_id": _id(key)})
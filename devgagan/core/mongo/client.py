@@ -0,0 +1,99 @@
+# ---------------------------------------------------
+# File Name: client.py
+# Description: A Pyrogram bot for downloading files from Telegram channels or groups
+#              and uploading them back to Telegram.
+# Author: Gagan
+# GitHub: https://github.com/devgaganin/
+# Telegram: https://t.me/team_spy_pro
+# YouTube: https://youtube.com/@dev_gagan
+# Created: 2025-01-11
+# Last Modified: 2025-01-11
+# Version: 2.0.5
+# License: MIT License
+# ---------------------------------------------------
+
+from pymongo import monitoring
+from motor.motor_asyncio import AsyncIOMotorClient as MongoCli
+from config import (
+    MONGO_DB,
+    MONGO_MAX_POOL_SIZE,
+    MONGO_MIN_POOL_SIZE,
+    MONGO_TIMEOUT_MS,
+    MONGO_READ_PREFERENCE
+)
+
+
+class PoolStats(monitoring.ConnectionPoolListener):
+    """Counts connection-pool events so pool sizes can be tuned from /stats."""
+
+    def __init__(self):
+        self.created = 0
+        self.closed = 0
+        self.checked_out = 0
+        self.in_use = 0
+        self.checkout_failed = 0
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        self.created += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        self.closed += 1
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        self.checkout_failed += 1
+
+    def connection_checked_out(self, event):
+        self.checked_out += 1
+        self.in_use += 1
+
+    def connection_checked_in(self, event):
+        self.in_use = max(self.in_use - 1, 0)
+
+    def as_dict(self):
+        return {
+            "open": self.created - self.closed,
+            "in_use": self.in_use,
+            "max": MONGO_MAX_POOL_SIZE,
+            "checkouts": self.checked_out,
+            "checkout_failed": self.checkout_failed,
+        }
+
+
+pool_stats = PoolStats()
+
+# The one client shared by every collection of the bot
+mongo = MongoCli(
+    MONGO_DB,
+    maxPoolSize=MONGO_MAX_POOL_SIZE,
+    minPoolSize=MONGO_MIN_POOL_SIZE,
+    serverSelectionTimeoutMS=MONGO_TIMEOUT_MS,
+    connectTimeoutMS=MONGO_TIMEOUT_MS,
+    readPreference=MONGO_READ_PREFERENCE,
+    event_listeners=[pool_stats]
+)
+
+tokens = mongo.telegram_bot.tokens
+user_data = mongo.user_data.users_data_db
+users = mongo.users.users_db
+premium = mongo.premium.premium_db
+settings = mongo.smart_users.super_user
+jobs = mongo.jobs.batch_jobs
+file_ids = mongo.cache.file_ids
@@ -12,11 +12,7 @@
 # License: MIT License
 # ---------------------------------------------------
 
-from config import MONGO_DB
-from motor.motor_asyncio import AsyncIOMotorClient as MongoCli
-mongo = MongoCli(MONGO_DB)
-db = mongo.user_data
-db = db.users_data_db
+from devgagan.core.mongo.client import user_data as db
 async def get_data(user_id):
     x = await db.find_one({"_id": user_id})
     return x
@@ -0,0 +1,165 @@
+# ---------------------------------------------------
+# File Name: jobs_db.py
+# Description: A Pyrogram bot for downloading files from Telegram channels or groups
+#              and uploading them back to Telegram.
+# Author: Gagan
+# GitHub: https://github.com/devgaganin/
+# Telegram: https://t.me/team_spy_pro
+# YouTube: https://youtube.com/@dev_gagan
+# Created: 2025-01-11
+# Last Modified: 2025-01-11
+# Version: 2.0.5
+# License: MIT License
+# ---------------------------------------------------
+
+import datetime
+import os
+import socket
+from pymongo import ReturnDocument
+from devgagan.core.mongo.client import jobs as db
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+CANCELLED = "cancelled"
+FAILED = "failed"
+
+# A running job whose heartbeat is older than this belongs to a dead process
+STALE_AFTER = 120
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _now():
+    return datetime.datetime.utcnow()
+
+
+async def create_job_index():
+    await db.create_index([("status", 1), ("heartbeat", 1)])
+    await db.create_index("user_id")
+
+
+async def create_job(user_id, link, start, count, target_chat, settings, freecheck, message_id, pin_msg_id, claim=True):
+    """Persist a batch; with ``claim`` this process runs it, otherwise it waits for a worker.
+
+    ``cursor`` is the first message id not yet delivered; everything before it
+    has been sent in order and is skipped when the job resumes.
+    """
+    now = _now()
+    job = {
+        "user_id": user_id,
+        "link": link,
+        "start": start,
+        "count": count,
+        "cursor": start,
+        "target_chat": target_chat,
+        "settings": settings,
+        "freecheck": freecheck,
+        "message_id": message_id,
+        "pin_msg_id": pin_msg_id,
+        "status": RUNNING if claim else PENDING,
+        "worker": WORKER_ID if claim else None,
+        "heartbeat": now,
+        "cancel": False,
+        "created_at": now,
+    }
+    result = await db.insert_one(job)
+    job["_id"] = result.inserted_id
+    return job
+
+
+async def claim_job(job_id):
+    """Take over a pending or orphaned job; returns it, or None if someone else holds it."""
+    now = _now()
+    return await db.find_one_and_update(
+        {
+            "_id": job_id,
+            "$or": [
+                {"status": PENDING},
+                {"status": RUNNING, "heartbeat": {"$lt": now - datetime.timedelta(seconds=STALE_AFTER)}},
+            ],
+            "cancel": {"$ne": True},
+        },
+        {"$set": {"status": RUNNING, "worker": WORKER_ID, "heartbeat": now}},
+        return_document=ReturnDocument.AFTER
+    )
+
+
+async def claimable_jobs():
+    """``{"_id", "user_id"}`` of jobs that are waiting or whose worker stopped sending heartbeats."""
+    stale = _now() - datetime.timedelta(seconds=STALE_AFTER)
+    cursor = db.find(
+        {
+            "$or": [{"status": PENDING}, {"status": RUNNING, "heartbeat": {"$lt": stale}}],
+            "cancel": {"$ne": True},
+        },
+        {"_id": 1, "user_id": 1}
+    ).sort("created_at", 1)
+    return [doc async for doc in cursor]
+
+
+async def unclaim_job(job_id):
+    """Put a job this process claimed but cannot run right now back in the queue."""
+    await db.update_one(
+        {"_id": job_id, "worker": WORKER_ID, "status": RUNNING},
+        {"$set": {"status": PENDING, "worker": None}}
+    )
+
+
+def _owned(job_id):
+    # Another worker re-claims a job whose heartbeat went stale; from then on it is not ours
+    return {"_id": job_id, "worker": WORKER_ID, "status": RUNNING}
+
+
+async def heartbeat(job_id):
+    """Refresh the job's heartbeat; returns False once a cancel was requested or the job was taken over."""
+    job = await db.find_one_and_update(
+        _owned(job_id),
+        {"$set": {"heartbeat": _now()}},
+        {"cancel": 1}
+    )
+    return bool(job) and not job.get("cancel")
+
+
+async def active_job(user_id):
+    return await db.find_one({"user_id": user_id, "status": {"$in": [PENDING, RUNNING]}, "cancel": {"$ne": True}})
+
+
+async def request_cancel(user_id):
+    """Flag a user's queued or running jobs; the worker holding one stops at its next heartbeat."""
+    result = await db.update_many(
+        {"user_id": user_id, "status": {"$in": [PENDING, RUNNING]}, "cancel": {"$ne": True}},
+        {"$set": {"cancel": True}}
+    )
+    await db.update_many({"user_id": user_id, "status": PENDING}, {"$set": {"status": CANCELLED}})
+    return result.modified_count
+
+
+async def job_counts():
+    counts = {PENDING: 0, RUNNING: 0}
+    async for doc in db.aggregate([
+        {"$match": {"status": {"$in": [PENDING, RUNNING]}}},
+        {"$group": {"_id": "$status", "count": {"$sum": 1}}}
+    ]):
+        counts[doc["_id"]] = doc["count"]
+    return counts
+
+
+async def advance_job(job_id, cursor):
+    """Save the cursor; returns False when this process no longer owns the job."""
+    result = await db.update_one(
+        _owned(job_id),
+        {"$set": {"cursor": cursor, "heartbeat": _now()}}
+    )
+    return result.matched_count == 1
+
+
+async def finish_job(job_id, status):
+    await db.update_one(
+        _owned(job_id),
+        {"$set": {"status": status, "finished_at": _now()}}
+    )
+
+
+async def release_jobs():
+    """Hand this process's running jobs back to the queue before a planned restart."""
+    await db.update_many({"status": RUNNING, "worker": WORKER_ID}, {"$set": {"status": PENDING, "worker": None}})
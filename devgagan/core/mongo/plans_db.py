@@ -12,26 +12,44 @@
 # License: MIT License
 # ---------------------------------------------------
 
+import asyncio
 import datetime
-from motor.motor_asyncio import AsyncIOMotorClient as MongoCli
-from config import MONGO_DB
- 
-mongo = MongoCli(MONGO_DB)
-db = mongo.premium
-db = db.premium_db
+import time
+from devgagan.core.mongo.client import premium as db
+
+PREMIUM_CACHE_TTL = 300
+# user_id -> (is_premium, expire_date, checked_at)
+_premium_cache = {}
+# Set when a plan is added so the expiry timer re-reads the next expiry date
+plan_changed = asyncio.Event()
+sweeper_stats = {"runs": 0, "examined": 0, "removed": 0, "last_run": None}
  
 async def add_premium(user_id, expire_date):
-    data = await check_premium(user_id)
-    if data and data.get("_id"):
-        await db.update_one({"_id": user_id}, {"$set": {"expire_date": expire_date}})
-    else:
-        await db.insert_one({"_id": user_id, "expire_date": expire_date})
+    await db.update_one({"_id": user_id}, {"$set": {"expire_date": expire_date}}, upsert=True)
+    _premium_cache.pop(user_id, None)
+    plan_changed.set()
  
 async def remove_premium(user_id):
     await db.delete_one({"_id": user_id})
+    _premium_cache.pop(user_id, None)
  
 async def check_premium(user_id):
     return await db.find_one({"_id": user_id})
+
+async def is_premium(user_id):
+    """Point lookup of a user's plan, cached until TTL or until the plan itself expires."""
+    now = datetime.datetime.utcnow()
+    cached = _premium_cache.get(user_id)
+    if cached and time.time() - cached[2] < PREMIUM_CACHE_TTL:
+        premium, expire_date, _ = cached
+        if not premium or not expire_date or expire_date > now:
+            return premium
+    data = await db.find_one({"_id": user_id}, {"expire_date": 1})
+    expire_date = data.get("expire_date") if data else None
+    # Documents without an expiry are premium until removed
+    premium = bool(data) and (not expire_date or expire_date > now)
+    _premium_cache[user_id] = (premium, expire_date, time.time())
+    return premium
  
 async def premium_users():
     id_list = []
@@ -39,11 +57,29 @@ async def premium_users():
         id_list.append(data["_id"])
     return id_list
  
+async def create_expiry_index():
+    await db.create_index("expire_date")
+
+async def next_expiry():
+    """Earliest expire_date still stored, served from the expire_date index."""
+    data = await db.find_one({"expire_date": {"$ne": None}}, {"expire_date": 1}, sort=[("expire_date", 1)])
+    return data["expire_date"] if data else None
+
 async def check_and_remove_expired_users():
+    """Remove every expired plan with one range query and one delete_many."""
     current_time = datetime.datetime.utcnow()
-    async for data in db.find():
-        expire_date = data.get("expire_date")
-        if expire_date and expire_date < current_time:
-            await remove_premium(data["_id"])
-            print(f"Removed user {data['_id']} due to expired plan.")
- 
\ No newline at end of file
+    expired = [data["_id"] async for data in db.find({"expire_date": {"$lt": current_time}}, {"_id": 1})]
+    removed = 0
+    if expired:
+        result = await db.delete_many({"_id": {"$in": expired}, "expire_date": {"$lt": current_time}})
+        removed = result.deleted_count
+        for user_id in expired:
+            _premium_cache.pop(user_id, None)
+            print(f"Removed user {user_id} due to expired plan.")
+    sweeper_stats["runs"] += 1
+    sweeper_stats["examined"] += len(expired)
+    sweeper_stats["removed"] += removed
+    sweeper_stats["last_run"] = current_time
+    if expired:
+        print(f"Expiry sweep: examined {len(expired)}, removed {removed}")
+    return len(expired), removed
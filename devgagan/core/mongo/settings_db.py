@@ -0,0 +1,136 @@
+# ---------------------------------------------------
+# File Name: settings_db.py
+# Description: A Pyrogram bot for downloading files from Telegram channels or groups
+#              and uploading them back to Telegram.
+# Author: Gagan
+# GitHub: https://github.com/devgaganin/
+# Telegram: https://t.me/team_spy_pro
+# YouTube: https://youtube.com/@dev_gagan
+# Created: 2025-01-11
+# Last Modified: 2025-01-11
+# Version: 2.0.5
+# License: MIT License
+# ---------------------------------------------------
+
+import time
+from devgagan.core.mongo.client import settings as db
+
+SETTINGS_TTL = 300  # seconds a cached settings document stays fresh
+
+# user_id -> (settings dict, loaded_at)
+_cache = {}
+
+
+def invalidate(user_id):
+    _cache.pop(user_id, None)
+
+
+def prime(user_id, settings):
+    """Serve ``settings`` for the user as if just loaded, e.g. a batch job's snapshot on a worker."""
+    _cache[user_id] = (dict(settings), time.time())
+
+
+async def create_settings_index():
+    # get_settings also matches the upload-method documents by user_id
+    await db.create_index("user_id", sparse=True)
+
+
+async def get_settings(user_id):
+    """All settings of a user in one round trip, served from cache while fresh.
+
+    Settings live in two documents: ``{"_id": user_id}`` (words, flags) and
+    ``{"user_id": user_id}`` (upload method); both are merged here.
+    """
+    cached = _cache.get(user_id)
+    if cached and time.time() - cached[1] < SETTINGS_TTL:
+        return cached[0]
+    settings = {}
+    async for doc in db.find({"$or": [{"_id": user_id}, {"user_id": user_id}]}):
+        settings.update({k: v for k, v in doc.items() if k not in ("_id", "user_id")})
+    _cache[user_id] = (settings, time.time())
+    return settings
+
+
+async def get_setting(user_id, key, default=None):
+    try:
+        settings = await get_settings(user_id)
+    except Exception as e:
+        print(f"Error loading {key}: {e}")
+        return default
+    value = settings.get(key)
+    return default if value is None else value
+
+
+# Writes raise on failure so the user is not told a setting was saved when it was
+# not; the cache is dropped either way
+
+
+async def set_setting(user_id, key, value):
+    try:
+        await db.update_one({"_id": user_id}, {"$set": {key: value}}, upsert=True)
+    finally:
+        invalidate(user_id)
+
+
+async def set_upload_method(user_id, method):
+    try:
+        await db.update_one({"user_id": user_id}, {"$set": {"upload_method": method}}, upsert=True)
+    finally:
+        invalidate(user_id)
+
+
+async def reset_settings(user_id, keys):
+    unset = {key: "" for key in keys}
+    try:
+        await db.update_one({"_id": user_id}, {"$unset": unset})
+        await db.update_one({"user_id": user_id}, {"$unset": unset})
+    finally:
+        invalidate(user_id)
+
+
+# Channels protected with /lock, kept in memory so every link is checked without I/O
+locked_channels = set()
+
+
+def is_channel_locked(channel_id):
+    return channel_id in locked_channels
+
+
+async def create_lock_index():
+    """One document per locked channel, enforced by a unique index.
+
+    /lock used to insert a new document on every call; those duplicates are
+    removed first, so the stored count is the number of locked channels.
+    """
+    async for dup in db.aggregate([
+        {"$match": {"channel_id": {"$exists": True}}},
+        {"$group": {"_id": "$channel_id", "ids": {"$push": "$_id"}, "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": 1}}}
+    ]):
+        await db.delete_many({"_id": {"$in": dup["ids"][1:]}})
+    indexes = await db.index_information()
+    if "channel_id_1" in indexes and not indexes["channel_id_1"].get("unique"):
+        await db.drop_index("channel_id_1")
+    await db.create_index("channel_id", unique=True, sparse=True)
+
+
+async def load_locked_channels():
+    """Load the locked channels once at startup."""
+    channel_ids = set()
+    async for doc in db.find({"channel_id": {"$exists": True}}, {"channel_id": 1}):
+        channel_ids.add(doc["channel_id"])
+    locked_channels.clear()
+    locked_channels.update(channel_ids)
+    return len(locked_channels)
+
+
+async def refresh_locked_channels():
+    """Cheap version check: reload only when the stored count differs from ours."""
+    count = await db.count_documents({"channel_id": {"$exists": True}})
+    if count != len(locked_channels):
+        await load_locked_channels()
+
+
+async def lock_channel(channel_id):
+    await db.update_one({"channel_id": channel_id}, {"$set": {"channel_id": channel_id}}, upsert=True)
+    locked_channels.add(channel_id)
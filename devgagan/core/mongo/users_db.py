@@ -12,43 +12,60 @@
 # License: MIT License
 # ---------------------------------------------------
 
-from config import MONGO_DB
-from motor.motor_asyncio import AsyncIOMotorClient as MongoCli
-
-
-mongo = MongoCli(MONGO_DB)
-db = mongo.users
-db = db.users_db
+from pymongo.errors import DuplicateKeyError
+from devgagan.core.mongo.client import users as db
 
 
 async def get_users():
   user_list = []
-  async for user in db.users.find({"user": {"$gt": 0}}):
+  async for user in db.users.find({"user": {"$gt": 0}}, {"user": 1}):
     user_list.append(user['user'])
   return user_list
 
 
+# Users already known to be registered; a hit here costs no database call
+known_users = set()
+
+
+async def create_user_index():
+  # Earlier non-atomic registrations left duplicates behind; keep one document per user
+  # so the unique index can be built
+  async for dup in db.users.aggregate([
+    {"$match": {"user": {"$exists": True}}},
+    {"$group": {"_id": "$user", "ids": {"$push": "$_id"}, "count": {"$sum": 1}}},
+    {"$match": {"count": {"$gt": 1}}}
+  ]):
+    await db.users.delete_many({"_id": {"$in": dup["ids"][1:]}})
+  # The plain index from before has the same name, so it must go first
+  indexes = await db.users.index_information()
+  if "user_1" in indexes and not indexes["user_1"].get("unique"):
+    await db.users.drop_index("user_1")
+  await db.users.create_index("user", unique=True, partialFilterExpression={"user": {"$exists": True}})
+
+
+async def count_users():
+  return await db.users.count_documents({"user": {"$gt": 0}})
+
+
 async def get_user(user):
-  users = await get_users()
-  if user in users:
+  if user in known_users:
+    return True
+  if await db.users.find_one({"user": user}, {"_id": 1}):
+    known_users.add(user)
     return True
-  else:
-    return False
+  return False
+
 
 async def add_user(user):
-  users = await get_users()
-  if user in users:
+  if user in known_users:
     return
-  else:
-    await db.users.insert_one({"user": user})
+  try:
+    await db.users.update_one({"user": user}, {"$setOnInsert": {"user": user}}, upsert=True)
+  except DuplicateKeyError:
+    pass  # a concurrent upsert inserted the user first
+  known_users.add(user)
 
 
 async def del_user(user):
-  users = await get_users()
-  if not user in users:
-    return
-  else:
-    await db.users.delete_one({"user": user})
-    
-
-
+  await db.users.delete_one({"user": user})
+  known_users.discard(user)
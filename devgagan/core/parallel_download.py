@@ -0,0 +1,129 @@
+# ---------------------------------------------------
+# File Name: parallel_download.py
+# Description: A Pyrogram bot for downloading files from Telegram channels or groups
+#              and uploading them back to Telegram.
+# Author: Gagan
+# GitHub: https://github.com/devgaganin/
+# Telegram: https://t.me/team_spy_pro
+# YouTube: https://youtube.com/@dev_gagan
+# Created: 2025-01-11
+# Last Modified: 2025-01-11
+# Version: 2.0.5
+# License: MIT License
+# ---------------------------------------------------
+
+import asyncio
+import math
+import os
+from config import PARALLEL_DOWNLOAD_CONNECTIONS, SCRATCH_DIR
+from devgagan.core.journal import journal_path, load_journal, save_journal
+
+CHUNK_SIZE = 1024 * 1024  # stream_media always yields 1 MiB chunks
+SEGMENT_CHUNKS = 16  # chunks fetched by one worker before it picks the next segment
+SEGMENT_RETRIES = 3
+DOWNLOAD_DIR = SCRATCH_DIR
+
+
+def preallocate(file_path, file_size):
+    # Unlink first: the old path may be a hard link shared with the file cache
+    if os.path.exists(file_path):
+        os.remove(file_path)
+    with open(file_path, "wb") as f:
+        if hasattr(os, "posix_fallocate") and file_size:
+            os.posix_fallocate(f.fileno(), 0, file_size)
+        else:
+            f.truncate(file_size)
+
+
+def media_unique_id(message):
+    media = getattr(message, message.media.value, None) if message.media else None
+    return getattr(media, "file_unique_id", None)
+
+
+async def parallel_download(client, message, file_name, file_size, connections=PARALLEL_DOWNLOAD_CONNECTIONS,
+                            progress=None, progress_args=(), directory=DOWNLOAD_DIR):
+    """Download ``message`` media with several GetFile streams in flight at once.
+
+    The file is split into segments that workers pull from a queue; every worker
+    streams its segment with ``stream_media`` (which opens a media session on the
+    DC named in the file id and imports an exported authorization there) and
+    writes it in place with ``os.pwrite`` into a preallocated file. Pyrogram runs
+    each stream under the client's transmission semaphore, so no more workers are
+    started than ``max_concurrent_transmissions`` allows.
+
+    ``get_file`` logs and swallows request errors (a migrated DC, an expired file
+    reference), which ends a stream early: a short segment is fetched again with
+    a freshly loaded message. Finished segments are recorded in a sidecar
+    journal, so a failed or interrupted download resumes where it stopped; the
+    journal is kept until the caller drops it after delivery. Returns the file
+    path.
+    """
+    os.makedirs(directory, exist_ok=True)
+    file_path = os.path.join(directory, os.path.basename(file_name))
+    journal = journal_path(file_path, "download")
+    key = media_unique_id(message)
+
+    state = load_journal(journal)
+    if (state.get("size") == file_size and state.get("key") == key
+            and os.path.exists(file_path) and os.path.getsize(file_path) == file_size):
+        finished = set(state.get("segments", []))
+    else:
+        preallocate(file_path, file_size)
+        finished = set()
+        save_journal(journal, {"size": file_size, "key": key, "segments": []})
+
+    total_chunks = math.ceil(file_size / CHUNK_SIZE)
+    segments = asyncio.Queue()
+    done = 0
+    for start in range(0, total_chunks, SEGMENT_CHUNKS):
+        count = min(SEGMENT_CHUNKS, total_chunks - start)
+        if start in finished:
+            done += min(count * CHUNK_SIZE, file_size - start * CHUNK_SIZE)
+        else:
+            segments.put_nowait((start, count))
+
+    fd = os.open(file_path, os.O_WRONLY)
+    source = message
+
+    async def fetch(start, count):
+        nonlocal done, source
+        end = min((start + count) * CHUNK_SIZE, file_size)
+        for attempt in range(SEGMENT_RETRIES):
+            if attempt:
+                source = await client.get_messages(message.chat.id, message.id)
+            position = start * CHUNK_SIZE
+            async for chunk in client.stream_media(source, limit=count, offset=start):
+                os.pwrite(fd, chunk, position)
+                position += len(chunk)
+                done += len(chunk)
+                if progress:
+                    try:
+                        await progress(done, file_size, *progress_args)
+                    except Exception:
+                        pass
+            if position >= end:
+                return
+            done -= position - start * CHUNK_SIZE
+        raise ConnectionError(f"Segment at chunk {start} stopped short {SEGMENT_RETRIES} times")
+
+    async def worker():
+        while True:
+            try:
+                start, count = segments.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            await fetch(start, count)
+            finished.add(start)
+            save_journal(journal, {"size": file_size, "key": key, "segments": sorted(finished)})
+
+    connections = min(max(1, connections), getattr(client, "max_concurrent_transmissions", 1))
+    tasks = [asyncio.create_task(worker()) for _ in range(connections)]
+    try:
+        await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        # On failure the partial file and its journal stay on disk for the next attempt
+        os.close(fd)
+    return file_path
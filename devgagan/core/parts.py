@@ -0,0 +1,160 @@
+# ---------------------------------------------------
+# File Name: parts.py
+# Description: A Pyrogram bot for downloading files from Telegram channels or groups
+#              and uploading them back to Telegram.
+# Author: Gagan
+# GitHub: https://github.com/devgaganin/
+# Telegram: https://t.me/team_spy_pro
+# YouTube: https://youtube.com/@dev_gagan
+# Created: 2025-01-11
+# Last Modified: 2025-01-11
+# Version: 2.0.5
+# License: MIT License
+# ---------------------------------------------------
+
+import asyncio
+import io
+import os
+from pyrogram import raw, types, utils
+from devgagan.core.journal import load_journal, save_journal
+
+# Maximum part size set to 2000 MiB (~2GB per part)
+MAX_PART_SIZE = 2000 * 1024**2
+PARALLEL_PARTS = 2
+
+
+class FileWindow(io.RawIOBase):
+    """Read-only view of ``length`` bytes of ``path`` starting at ``offset``.
+
+    Reads go straight to the original file with ``os.pread``, so a part can be
+    handed to ``save_file`` without writing a chunk file or buffering it in RAM.
+    """
+
+    def __init__(self, path, offset, length, name):
+        super().__init__()
+        self._fd = os.open(path, os.O_RDONLY)
+        self.offset = offset
+        self.length = length
+        self.name = name
+        self.pos = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self.pos
+
+    def seek(self, pos, whence=os.SEEK_SET):
+        if whence == os.SEEK_CUR:
+            pos += self.pos
+        elif whence == os.SEEK_END:
+            pos += self.length
+        self.pos = min(max(pos, 0), self.length)
+        return self.pos
+
+    def readinto(self, buffer):
+        size = min(len(buffer), self.length - self.pos)
+        if size <= 0:
+            return 0
+        data = os.pread(self._fd, size, self.offset + self.pos)
+        buffer[:len(data)] = data
+        self.pos += len(data)
+        return len(data)
+
+    def close(self):
+        if not self.closed:
+            os.close(self._fd)
+        super().close()
+
+
+def file_windows(path, part_size=MAX_PART_SIZE):
+    """Split ``path`` into virtual parts named ``<name>.partN``."""
+    file_size = os.path.getsize(path)
+    name = os.path.basename(path)
+    return [
+        FileWindow(path, offset, min(part_size, file_size - offset), f"{name}.part{index + 1}")
+        for index, offset in enumerate(range(0, file_size, part_size))
+    ]
+
+
+async def send_uploaded_document(client, chat_id, file, file_name, caption, reply_to_message_id=None):
+    """Send an already uploaded InputFile as a document and return the Message.
+
+    Returns None when Telegram's answer carries no new message update.
+    """
+    text = await utils.parse_text_entities(client, caption, None, None)
+    r = await client.invoke(
+        raw.functions.messages.SendMedia(
+            peer=await client.resolve_peer(chat_id),
+            media=raw.types.InputMediaUploadedDocument(
+                mime_type="application/octet-stream",
+                file=file,
+                attributes=[raw.types.DocumentAttributeFilename(file_name=file_name)]
+            ),
+            reply_to=raw.types.InputReplyToMessage(reply_to_msg_id=reply_to_message_id) if reply_to_message_id else None,
+            random_id=client.rnd_id(),
+            **text
+        )
+    )
+    for update in r.updates:
+        if isinstance(update, (raw.types.UpdateNewMessage, raw.types.UpdateNewChannelMessage)):
+            return await types.Message._parse(
+                client, update.message,
+                {u.id: u for u in r.users},
+                {c.id: c for c in r.chats}
+            )
+
+
+async def upload_file_parts(client, chat_id, path, caption, reply_to_message_id=None, part_size=MAX_PART_SIZE,
+                            parallel=PARALLEL_PARTS, progress=None, progress_args=(), journal=None):
+    """Upload ``path`` as ``<=part_size`` documents without creating chunk files.
+
+    Up to ``parallel`` parts upload at the same time (Pyrogram also caps this at the
+    client's ``max_concurrent_transmissions``); the part messages are still sent
+    in order. With a ``journal`` path, parts already sent to the same chat by
+    an earlier attempt are skipped. Returns the list of newly sent messages, with
+    None for a part whose message could not be parsed.
+    """
+    all_windows = file_windows(path, part_size)
+    total = len(all_windows)
+    state = load_journal(journal) if journal else {}
+    if state.get("chat_id") != chat_id or state.get("part_size") != part_size:
+        state = {"chat_id": chat_id, "part_size": part_size, "sent": []}
+    windows = []
+    for index, window in enumerate(all_windows):
+        if index in state["sent"]:
+            window.close()
+        else:
+            window.index = index
+            windows.append(window)
+    if journal:
+        save_journal(journal, state)
+    slots = asyncio.Semaphore(parallel)
+
+    async def save(window):
+        async with slots:
+            try:
+                return await client.save_file(window, progress=progress, progress_args=progress_args)
+            finally:
+                window.close()
+
+    tasks = [asyncio.create_task(save(window)) for window in windows]
+    messages = []
+    try:
+        for window, task in zip(windows, tasks):
+            part_caption = f"{caption or ''}\n\nPart {window.index + 1} of {total}"
+            messages.append(await send_uploaded_document(
+                client, chat_id, await task, window.name, part_caption, reply_to_message_id
+            ))
+            if journal:
+                state["sent"].append(window.index)
+                save_journal(journal, state)
+    finally:
+        for task in tasks:
+            task.cancel()
+        for window in windows:
+            window.close()
+    return messages
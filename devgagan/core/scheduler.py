@@ -0,0 +1,210 @@
+# ---------------------------------------------------
+# File Name: scheduler.py
+# Description: A Pyrogram bot for downloading files from Telegram channels or groups
+#              and uploading them back to Telegram.
+# Author: Gagan
+# GitHub: https://github.com/devgaganin/
+# Telegram: https://t.me/team_spy_pro
+# YouTube: https://youtube.com/@dev_gagan
+# Created: 2025-01-11
+# Last Modified: 2025-01-11
+# Version: 2.0.5
+# License: MIT License
+# ---------------------------------------------------
+
+import asyncio
+import itertools
+import time
+from contextlib import asynccontextmanager
+from config import OWNER_ID, TRANSFER_SLOTS, PREMIUM_USER_SLOTS, FREE_SLOT_SHARE, PREMIUM_QUEUE_LIMIT
+from devgagan.core.func import TimeFormatter
+
+# Plans in priority order; a lower number is served first
+OWNER, PREMIUM, VERIFIED, FREE = range(4)
+
+
+def plan_priority(user_id, freecheck, verified=False):
+    """Map the result of ``chk_user`` and the /token check to a scheduler plan."""
+    if user_id in OWNER_ID:
+        return OWNER
+    if freecheck != 1:
+        return PREMIUM
+    return VERIFIED if verified else FREE
+
+
+class QueueFull(Exception):
+    """The user already has as many jobs waiting as their plan allows."""
+
+
+def queue_text(position, eta):
+    return (
+        f"⏳ You are **#{position}** in the queue.\n"
+        f"Estimated start in **{TimeFormatter(milliseconds=eta * 1000) or '0s'}**; it starts on its own."
+    )
+
+
+class TransferScheduler:
+    """Admits transfer jobs by plan under global, per-plan and per-user limits.
+
+    A slot is one transfer in flight. A single link or a /dl job holds one slot;
+    a batch holds as many slots as transfers it runs at once (its ``weight``), so
+    ``slots`` caps every concurrent transfer on the bot. Transfers stream at
+    roughly the same rate, so a share of the slots is a share of the bandwidth:
+    verified and free users together may hold at most ``free_share`` of it and
+    paying users always find some. Each user runs at most ``user_slots(priority)``
+    jobs at once.
+
+    Waiting jobs are served owner > premium > verified-token > free, first come
+    first served within a plan; a job that only waits for free slots holds back
+    the jobs queued behind it, so small jobs cannot starve a batch.
+    """
+
+    def __init__(self, slots, premium_user_slots, free_share, premium_queue_limit, average_item=60):
+        self.slots = max(1, slots)
+        self.premium_user_slots = max(1, premium_user_slots)
+        self.premium_queue_limit = max(1, premium_queue_limit)
+        self.free_slots = max(1, int(self.slots * free_share))
+        self.average_item = average_item
+        # Slot-seconds one item of each kind of job used recently, for the queue ETA
+        self.item_cost = {}
+        self.active = 0
+        self.active_free = 0
+        self.per_user = {}
+        # Waiting tickets: [priority, seq, user_id, future, weight, kind, items]
+        self.waiting = []
+        self._seq = itertools.count()
+
+    def user_slots(self, priority):
+        if priority == OWNER:
+            return self.slots
+        if priority == PREMIUM:
+            return self.premium_user_slots
+        return 1
+
+    def queue_limit(self, priority):
+        """Jobs a user may have waiting; None means no limit."""
+        if priority == OWNER:
+            return None
+        if priority == PREMIUM:
+            return self.premium_queue_limit
+        return 1
+
+    def queued(self, user_id):
+        return sum(1 for ticket in self.waiting if ticket[2] == user_id)
+
+    def grant(self, priority, weight):
+        """The slots a job asking for ``weight`` gets: never more than its plan could ever hold."""
+        return max(1, min(weight, self.free_slots if priority >= VERIFIED else self.slots))
+
+    def _has_room(self, priority, weight):
+        if self.active + weight > self.slots:
+            return False
+        return priority < VERIFIED or self.active_free + weight <= self.free_slots
+
+    def _can_start(self, user_id, priority, weight):
+        return self._has_room(priority, weight) and self.per_user.get(user_id, 0) < self.user_slots(priority)
+
+    def _start(self, user_id, priority, weight):
+        self.active += weight
+        if priority >= VERIFIED:
+            self.active_free += weight
+        self.per_user[user_id] = self.per_user.get(user_id, 0) + 1
+
+    def _dispatch(self):
+        for ticket in list(self.waiting):
+            priority, _, user_id, future, weight = ticket[:5]
+            if future.done() or self.per_user.get(user_id, 0) >= self.user_slots(priority):
+                continue
+            if not self._has_room(priority, weight):
+                break
+            self.waiting.remove(ticket)
+            self._start(user_id, priority, weight)
+            future.set_result(True)
+
+    def position(self, ticket):
+        return self.waiting.index(ticket) + 1
+
+    def cost(self, kind, items=1):
+        """Expected slot-seconds of a job, from recent jobs of the same kind."""
+        return items * self.item_cost.get(kind, self.average_item)
+
+    def eta(self, ticket):
+        """Rough seconds until ``ticket`` starts.
+
+        The jobs ahead of it must run first, and one running job has to end to
+        make room; both are estimated per item, so a long batch ahead of a
+        single link counts for its size.
+        """
+        ahead = self.waiting[:self.waiting.index(ticket)]
+        work = sum(self.cost(t[5], t[6]) for t in ahead) + self.cost(ticket[5])
+        return round(work / self.slots)
+
+    async def acquire(self, user_id, priority, on_queued=None, bounded=True, weight=1, kind="link", items=1):
+        """Wait for ``weight`` slots (see ``grant``); returns the number of slots granted."""
+        weight = self.grant(priority, weight)
+        if self._can_start(user_id, priority, weight) and not self.waiting:
+            self._start(user_id, priority, weight)
+            return weight
+        limit = self.queue_limit(priority)
+        if bounded and limit is not None and self.queued(user_id) >= limit:
+            raise QueueFull(f"You already have {limit} link(s) waiting in the queue. Please send more once they start.")
+        ticket = [priority, next(self._seq), user_id, asyncio.get_running_loop().create_future(), weight, kind, max(1, items)]
+        self.waiting.append(ticket)
+        self.waiting.sort(key=lambda t: (t[0], t[1]))
+        self._dispatch()
+        if ticket[3].done():
+            return weight
+        if on_queued:
+            try:
+                await on_queued(self.position(ticket), self.eta(ticket))
+            except Exception:
+                pass
+        try:
+            await ticket[3]
+        except asyncio.CancelledError:
+            if ticket[3].done() and not ticket[3].cancelled():
+                self.release(user_id, priority, weight)
+            elif ticket in self.waiting:
+                self.waiting.remove(ticket)
+                self._dispatch()
+            raise
+        return weight
+
+    def release(self, user_id, priority, weight=1, started_at=None, kind="link", items=1):
+        self.active -= weight
+        if priority >= VERIFIED:
+            self.active_free -= weight
+        self.per_user[user_id] -= 1
+        if not self.per_user[user_id]:
+            del self.per_user[user_id]
+        if started_at is not None:
+            # Moving average of the slot-seconds per item feeds the queue ETA
+            cost = weight * (time.time() - started_at) / max(1, items)
+            self.item_cost[kind] = 0.8 * self.item_cost.get(kind, cost) + 0.2 * cost
+        self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, user_id, priority, on_queued=None, bounded=True, weight=1, kind="link", items=1):
+        """Hold transfer slots for the duration of the ``async with`` block.
+
+        ``weight`` is how many transfers the job runs at once and ``items`` how
+        many it will deliver; the block gets the number of slots granted, which
+        the job must not exceed. With ``bounded`` the wait raises ``QueueFull``
+        once the user has ``queue_limit`` jobs waiting already.
+        """
+        weight = await self.acquire(user_id, priority, on_queued, bounded, weight, kind, items)
+        started_at = time.time()
+        try:
+            yield weight
+        finally:
+            self.release(user_id, priority, weight, started_at, kind, items)
+
+    def stats(self):
+        return {
+            "active": self.active,
+            "slots": self.slots,
+            "queued": len(self.waiting),
+        }
+
+
+transfer_scheduler = TransferScheduler(TRANSFER_SLOTS, PREMIUM_USER_SLOTS, FREE_SLOT_SHARE, PREMIUM_QUEUE_LIMIT)
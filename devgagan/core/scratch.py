@@ -0,0 +1,177 @@
+# ---------------------------------------------------
+# File Name: scratch.py
+# Description: A Pyrogram bot for downloading files from Telegram channels or groups
+#              and uploading them back to Telegram.
+# Author: Gagan
+# GitHub: https://github.com/devgaganin/
+# Telegram: https://t.me/team_spy_pro
+# YouTube: https://youtube.com/@dev_gagan
+# Created: 2025-01-11
+# Last Modified: 2025-01-11
+# Version: 2.0.5
+# License: MIT License
+# ---------------------------------------------------
+
+import glob
+import os
+import re
+import shutil
+import time
+from config import SCRATCH_DIR, SCRATCH_MIN_FREE
+from devgagan.core.file_cache import file_cache
+
+ORPHAN_AGE = 6 * 3600  # untouched job folders older than this are leftovers
+JOURNAL_AGE = 24 * 3600  # resumable transfers are kept this long
+STARTUP_AGE = 600  # at boot nothing of ours runs yet, so idle folders go sooner
+
+# job folder -> number of transfers using it in this process
+_leases = {}
+# Every process holding a folder keeps a ".lease.<pid>" file in it, so the janitor
+# of another process (front-end and transfer workers share the disk) leaves it alone
+LEASE_PREFIX = ".lease."
+# Bytes admitted but not written to disk yet
+_reserved = 0
+
+
+class NoSpace(Exception):
+    """Not enough free disk space to admit a transfer."""
+
+
+def free_space():
+    os.makedirs(SCRATCH_DIR, exist_ok=True)
+    return shutil.disk_usage(SCRATCH_DIR).free
+
+
+def has_space(size):
+    return free_space() - _reserved - size >= SCRATCH_MIN_FREE
+
+
+def job_dir(*parts):
+    name = "-".join(re.sub(r"[^\w.@]+", "_", str(part)) for part in parts)
+    return os.path.abspath(os.path.join(SCRATCH_DIR, name))
+
+
+def _lease_file(path):
+    return os.path.join(path, f"{LEASE_PREFIX}{os.getpid()}")
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except (PermissionError, OSError):
+        return True
+    return True
+
+
+def _leased_elsewhere(path):
+    """Whether a live process other than this one holds ``path``."""
+    try:
+        names = os.listdir(path)
+    except (NotADirectoryError, FileNotFoundError):
+        return False
+    for name in names:
+        if name.startswith(LEASE_PREFIX):
+            pid = name[len(LEASE_PREFIX):]
+            if pid.isdigit() and int(pid) != os.getpid() and _pid_alive(int(pid)):
+                return True
+    return False
+
+
+def admit(size):
+    """Reserve ``size`` more bytes of disk, trimming the file cache if needed; raises ``NoSpace``.
+
+    Give the bytes back through ``release(..., expected_size=...)``.
+    """
+    global _reserved
+    if size and not has_space(size):
+        file_cache.shrink(size + SCRATCH_MIN_FREE + _reserved - free_space())
+        if not has_space(size):
+            raise NoSpace(f"{size} bytes do not fit on disk right now")
+    _reserved += size
+
+
+def lease(*parts, expected_size=0):
+    """Admit a transfer of ``expected_size`` bytes and return its own scratch folder.
+
+    The same parts always map to the same folder, so a retried transfer finds its
+    partial file and journal again. Trims the file cache before giving up with
+    ``NoSpace``. Hand the folder back with ``release``.
+    """
+    admit(expected_size)
+    path = job_dir(*parts)
+    os.makedirs(path, exist_ok=True)
+    os.utime(path)
+    if path not in _leases:
+        open(_lease_file(path), "w").close()
+    _leases[path] = _leases.get(path, 0) + 1
+    return path
+
+
+def release(path, expected_size=0, keep=False):
+    """Give a job folder back; it is deleted unless ``keep`` (a resumable partial is inside)
+    or another process still holds it."""
+    global _reserved
+    _reserved = max(_reserved - expected_size, 0)
+    _leases[path] = _leases.get(path, 1) - 1
+    if _leases[path] <= 0:
+        del _leases[path]
+        try:
+            os.remove(_lease_file(path))
+        except FileNotFoundError:
+            pass
+        if not keep and not _leased_elsewhere(path):
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def _last_touched(path):
+    if os.path.isfile(path):
+        return os.path.getmtime(path)
+    latest = os.path.getmtime(path)
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                latest = max(latest, os.path.getmtime(os.path.join(root, name)))
+            except FileNotFoundError:
+                pass
+    return latest
+
+
+def _has_journal(path):
+    if os.path.isfile(path):
+        return False
+    return any(name.endswith((".download.json", ".upload.json")) for _, _, files in os.walk(path) for name in files)
+
+
+def clean_scratch(startup=False):
+    """Remove orphaned job folders and partial files; returns (removed, freed bytes).
+
+    Folders in use by this or another live process are skipped. Resumable transfers (with a
+    journal) are kept for ``JOURNAL_AGE``; anything else idle for ``ORPHAN_AGE``
+    (``STARTUP_AGE`` at boot) is removed, as are stray ffmpeg thumbnails.
+    """
+    os.makedirs(SCRATCH_DIR, exist_ok=True)
+    now = time.time()
+    removed = freed = 0
+    candidates = [os.path.abspath(os.path.join(SCRATCH_DIR, name)) for name in os.listdir(SCRATCH_DIR)]
+    candidates += [os.path.abspath(path) for path in glob.glob("thumb_*.jpg")]
+    for path in candidates:
+        if path in _leases or _leased_elsewhere(path):
+            continue
+        try:
+            age = now - _last_touched(path)
+            limit = JOURNAL_AGE if _has_journal(path) else (STARTUP_AGE if startup else ORPHAN_AGE)
+            if age < limit:
+                continue
+            if os.path.isdir(path):
+                size = sum(os.path.getsize(os.path.join(root, name)) for root, _, files in os.walk(path) for name in files)
+                shutil.rmtree(path, ignore_errors=True)
+            else:
+                size = os.path.getsize(path)
+                os.remove(path)
+        except FileNotFoundError:
+            continue
+        removed += 1
+        freed += size
+    return removed, freed
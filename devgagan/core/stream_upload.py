@@ -0,0 +1,86 @@
+# ---------------------------------------------------
+# File Name: stream_upload.py
+# Description: A Pyrogram bot for downloading files from Telegram channels or groups
+#              and uploading them back to Telegram.
+# Author: Gagan
+# GitHub: https://github.com/devgaganin/
+# Telegram: https://t.me/team_spy_pro
+# YouTube: https://youtube.com/@dev_gagan
+# Created: 2025-01-11
+# Last Modified: 2025-01-11
+# Version: 2.0.5
+# License: MIT License
+# ---------------------------------------------------
+
+import asyncio
+import math
+import os
+from telethon.helpers import generate_random_long
+from telethon.tl.functions.upload import SaveBigFilePartRequest
+from telethon.tl.types import InputFileBig
+
+PART_SIZE = 512 * 1024  # largest part Telegram accepts
+PARALLEL_PARTS = 4
+MAX_STREAM_SIZE = 4000 * PART_SIZE  # Telegram's part limit for one file
+POLL_INTERVAL = 0.5
+
+
+def _size(path):
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+async def upload_growing_file(client, path, size, writer, progress=None, progress_args=()):
+    """Upload ``path`` with Telethon while another process is still writing it.
+
+    ``size`` is the exact final size announced up front and ``writer`` is the
+    future of the download. Every part is sent as soon as its bytes are on disk,
+    so the upload trails the download instead of starting after it. Raises if
+    the writer fails or stops short of ``size``. Returns an ``InputFileBig`` for
+    ``send_file``.
+    """
+    file_id = generate_random_long()
+    total_parts = math.ceil(size / PART_SIZE)
+    parts = iter(range(total_parts))
+    done = 0
+    fd = None
+
+    async def wait_for(end):
+        nonlocal fd
+        while _size(path) < end:
+            if writer.done():
+                writer.result()
+                if _size(path) < end:
+                    raise ValueError("Download ended before the announced size")
+                break
+            await asyncio.sleep(POLL_INTERVAL)
+        if fd is None:
+            fd = os.open(path, os.O_RDONLY)
+
+    async def worker():
+        nonlocal done
+        for part in parts:
+            offset = part * PART_SIZE
+            length = min(PART_SIZE, size - offset)
+            await wait_for(offset + length)
+            data = os.pread(fd, length, offset)
+            await client(SaveBigFilePartRequest(file_id, part, total_parts, data))
+            done += length
+            if progress:
+                try:
+                    await progress(done, size, *progress_args)
+                except Exception:
+                    pass
+
+    tasks = [asyncio.create_task(worker()) for _ in range(PARALLEL_PARTS)]
+    try:
+        await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if fd is not None:
+            os.close(fd)
+    return InputFileBig(file_id, total_parts, os.path.basename(path))
@@ -0,0 +1,237 @@
+# ---------------------------------------------------
+# File Name: userbot_pool.py
+# Description: A Pyrogram bot for downloading files from Telegram channels or groups
+#              and uploading them back to Telegram.
+# Author: Gagan
+# GitHub: https://github.com/devgaganin/
+# Telegram: https://t.me/team_spy_pro
+# YouTube: https://youtube.com/@dev_gagan
+# Created: 2025-01-11
+# Last Modified: 2025-01-11
+# Version: 2.0.5
+# License: MIT License
+# ---------------------------------------------------
+
+import asyncio
+import hashlib
+import time
+from collections import OrderedDict
+from pyrogram import Client
+from pyrogram.errors import FloodWait
+from config import API_ID, API_HASH, USERBOT_POOL_SIZE, USERBOT_IDLE_TTL, MAX_CONCURRENT_TRANSMISSIONS
+
+DEVICE_MODEL = 'iPhone 16 Pro'
+HEALTH_CHECK_INTERVAL = 60  # seconds a client may sit idle before it is pinged again
+
+
+def session_hash(session):
+    return hashlib.sha256(session.encode()).hexdigest()[:16]
+
+
+class UserbotPool:
+    """Keeps started userbot clients warm between links.
+
+    Clients are keyed by ``(user_id, session_hash)`` so a fresh login never
+    reuses the old connection. Idle clients are evicted LRU-first when the pool
+    is full and stopped once they sit idle longer than ``idle_ttl``.
+    """
+
+    def __init__(self, max_size=USERBOT_POOL_SIZE, idle_ttl=USERBOT_IDLE_TTL):
+        self.max_size = max_size
+        self.idle_ttl = idle_ttl
+        self._entries = OrderedDict()  # key -> {"key", "client", "refs", "last_used", "last_check", ...}
+        self._owners = {}  # id(client) -> entry, retired entries included until their last release
+        self._cond = asyncio.Condition()
+
+    def __len__(self):
+        return len(self._entries)
+
+    async def acquire(self, user_id, session):
+        """Borrow a started client for ``user_id``; pair every call with ``release``.
+
+        The pool lock only covers the bookkeeping: the slot is reserved under it,
+        while the login, the health ping and every ``client.stop()`` run outside
+        it, so one slow or flood-waited client never holds up other users.
+
+        A client that turns out broken while another borrower still holds it is
+        retired instead of restarted: it leaves the pool, this caller gets a fresh
+        client, and the last ``release`` stops the old one.
+        """
+        key = (user_id, session_hash(session))
+        stopping = []
+        async with self._cond:
+            stopping += self._drop_stale_sessions(key)
+            entry = self._entries.get(key)
+            starting = entry is None
+            if starting:
+                while len(self._entries) >= self.max_size:
+                    evicted = self._evict_lru()
+                    if evicted:
+                        stopping.append(evicted)
+                    else:
+                        await self._cond.wait()
+                client = Client(
+                    f"userbot_{user_id}",
+                    api_id=API_ID,
+                    api_hash=API_HASH,
+                    device_model=DEVICE_MODEL,
+                    session_string=session,
+                    in_memory=True,
+                    max_concurrent_transmissions=MAX_CONCURRENT_TRANSMISSIONS
+                )
+                now = time.time()
+                entry = {
+                    "key": key, "client": client, "refs": 0, "last_used": now, "last_check": now,
+                    "ready": asyncio.get_running_loop().create_future(), "lock": asyncio.Lock()
+                }
+                self._entries[key] = entry
+                self._owners[id(client)] = entry
+            entry["refs"] += 1
+            entry["last_used"] = time.time()
+            self._entries.move_to_end(key)
+        await self._stop_clients(stopping)
+
+        shared_and_broken = False
+        try:
+            if starting:
+                try:
+                    await entry["client"].start()
+                except BaseException as e:
+                    # Whoever waits on this login fails with it instead of waiting forever
+                    entry["ready"].set_exception(e if isinstance(e, Exception) else ConnectionError("Userbot login was interrupted"))
+                    raise
+                entry["ready"].set_result(True)
+            else:
+                await asyncio.shield(entry["ready"])
+                async with entry["lock"]:
+                    if not await self._is_healthy(entry):
+                        # Restarting would cut off a transfer another borrower is running
+                        if entry["refs"] > 1:
+                            shared_and_broken = True
+                        else:
+                            await self._restart(entry)
+        except BaseException as e:
+            async with self._cond:
+                # A client that failed to log in or to reconnect leaves the pool
+                if starting or not isinstance(e, asyncio.CancelledError):
+                    self._retire(entry)
+                dead = self._unref(entry)
+                self._cond.notify_all()
+            await self._stop_clients([dead] if dead else [])
+            raise
+
+        if shared_and_broken:
+            async with self._cond:
+                self._retire(entry)
+                dead = self._unref(entry)
+                self._cond.notify_all()
+            await self._stop_clients([dead] if dead else [])
+            return await self.acquire(user_id, session)
+        return entry["client"]
+
+    async def release(self, client):
+        """Return a borrowed client to the pool; it stays connected unless it was retired."""
+        if client is None:
+            return
+        async with self._cond:
+            entry = self._owners.get(id(client))
+            if entry is None:
+                return
+            dead = self._unref(entry)
+            self._cond.notify_all()
+        await self._stop_clients([dead] if dead else [])
+
+    async def discard(self, user_id):
+        """Stop every idle client of ``user_id`` (e.g. after /logout)."""
+        async with self._cond:
+            stopping = [self._pop(k) for k, e in list(self._entries.items()) if k[0] == user_id and e["refs"] == 0]
+            self._cond.notify_all()
+        await self._stop_clients(stopping)
+
+    async def reap(self):
+        """Stop clients idle for longer than ``idle_ttl``. Returns how many were stopped."""
+        now = time.time()
+        async with self._cond:
+            stopping = [
+                self._pop(key) for key, entry in list(self._entries.items())
+                if entry["refs"] == 0 and now - entry["last_used"] > self.idle_ttl
+            ]
+            if stopping:
+                self._cond.notify_all()
+        await self._stop_clients(stopping)
+        return len(stopping)
+
+    async def close(self):
+        async with self._cond:
+            stopping = [self._pop(key) for key in list(self._entries)]
+        await self._stop_clients(stopping)
+
+    async def _is_healthy(self, entry):
+        client = entry["client"]
+        if not client.is_connected:
+            return False
+        if time.time() - entry["last_check"] < HEALTH_CHECK_INTERVAL:
+            return True
+        try:
+            await client.get_me()
+        except FloodWait:
+            # Telegram answered, so the connection works; it only asks us to slow down
+            return True
+        except Exception:
+            return False
+        entry["last_check"] = time.time()
+        return True
+
+    async def _restart(self, entry):
+        client = entry["client"]
+        try:
+            if client.is_connected:
+                await client.stop()
+        except Exception:
+            pass
+        await client.start()
+        entry["last_check"] = time.time()
+
+    # The helpers below run under self._cond. They only update the bookkeeping and
+    # return the entries to stop, which the caller does after leaving the lock.
+
+    def _drop_stale_sessions(self, key):
+        return [self._pop(k) for k, e in list(self._entries.items()) if k[0] == key[0] and k != key and e["refs"] == 0]
+
+    def _evict_lru(self):
+        for key, entry in self._entries.items():
+            if entry["refs"] == 0:
+                return self._pop(key)
+        return None
+
+    def _pop(self, key):
+        entry = self._entries.pop(key)
+        self._owners.pop(id(entry["client"]), None)
+        return entry
+
+    def _retire(self, entry):
+        """Take ``entry`` out of the pool; its client is stopped once nobody holds it."""
+        entry["retired"] = True
+        if self._entries.get(entry["key"]) is entry:
+            del self._entries[entry["key"]]
+
+    def _unref(self, entry):
+        entry["refs"] = max(entry["refs"] - 1, 0)
+        entry["last_used"] = time.time()
+        if entry["refs"] == 0 and entry.get("retired"):
+            self._owners.pop(id(entry["client"]), None)
+            return entry
+        return None
+
+    async def _stop_clients(self, entries):
+        for entry in entries:
+            client = entry["client"]
+            if not client.is_connected:
+                continue
+            try:
+                await client.stop()
+            except Exception as e:
+                print(f"Error stopping userbot {entry['key'][0]}: {e}")
+
+
+userbot_pool = UserbotPool()
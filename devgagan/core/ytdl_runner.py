@@ -0,0 +1,208 @@
+# ---------------------------------------------------
+# File Name: ytdl_runner.py
+# Description: A Pyrogram bot for downloading files from Telegram channels or groups
+#              and uploading them back to Telegram.
+# Author: Gagan
+# GitHub: https://github.com/devgaganin/
+# Telegram: https://t.me/team_spy_pro
+# YouTube: https://youtube.com/@dev_gagan
+# Created: 2025-01-11
+# Last Modified: 2025-01-11
+# Version: 2.0.5
+# License: MIT License
+# ---------------------------------------------------
+
+import asyncio
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+import aiofiles
+import aiohttp
+import ytdl_worker
+from config import YTDL_WORKERS
+
+INFO_TTL = 300  # seconds an extracted info dict (and its signed format URLs) is reused
+# Query parameters that only track where a link was shared from
+TRACKING_PARAMS = ("si", "feature", "igsh", "igshid", "utm_source", "utm_medium", "utm_campaign", "pp")
+
+_pool = None
+_session = None
+# (normalized url, format) -> (expires_at, future of the info dict)
+_info_cache = {}
+
+
+def ytdl_pool():
+    """Process pool for yt-dlp, so extraction and signature decoding stay off the event loop.
+
+    Workers are spawned, not forked: by the first /dl this process runs MongoDB
+    monitor threads, and a forked child could inherit one of their locks held.
+    They only import ``ytdl_worker``, never the ``devgagan`` package.
+    """
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=max(1, YTDL_WORKERS), mp_context=multiprocessing.get_context("spawn"))
+    return _pool
+
+
+async def extract_info(url, ydl_opts, download=False):
+    return await asyncio.get_running_loop().run_in_executor(ytdl_pool(), ytdl_worker.extract, url, ydl_opts, download)
+
+
+def _size(fmt):
+    return fmt.get("filesize") or fmt.get("filesize_approx") or 0
+
+
+# yt-dlp reports a missing stream as the codec "none"; a codec of None only means unknown
+def _has(fmt, kind):
+    return fmt.get(kind) != "none"
+
+
+def _streams_in_telegram(fmt):
+    vcodec = fmt.get("vcodec")
+    return fmt.get("ext") == "mp4" and (vcodec is None or vcodec.startswith(("avc1", "h264")))
+
+
+def _aac(fmt):
+    acodec = fmt.get("acodec")
+    if acodec is None:
+        return fmt.get("ext") in ("mp4", "m4a")
+    return acodec.startswith(("mp4a", "aac"))
+
+
+def select_format(info, max_size):
+    """Pick the best formats of ``info`` whose combined size fits ``max_size``.
+
+    Candidates are formats that may carry video and audio (unknown codecs
+    included) and every video-only format paired with the best audio (AAC
+    first); a source with audio only yields its audio formats. Among the ones
+    with a known size under the cap, H.264/AAC MP4 wins over other codecs, then
+    height, frame rate and bitrate; formats of unknown size are only used when
+    none of known size fits. Returns the list of chosen format dicts (one, or
+    video + audio), or None.
+    """
+    formats = [f for f in info.get("formats") or [info] if f.get("format_id")]
+    audios = [f for f in formats if not _has(f, "vcodec") and _has(f, "acodec")]
+    audio = max(audios, key=lambda f: (_aac(f), f.get("abr") or f.get("tbr") or 0), default=None)
+    candidates = []
+    for f in formats:
+        if not _has(f, "vcodec"):
+            continue
+        if _has(f, "acodec"):
+            candidates.append([f])
+        elif audio:
+            candidates.append([f, audio])
+    if not candidates:
+        candidates = [[f] for f in audios]
+
+    def rank(chosen):
+        video = chosen[0]
+        known = all(_size(f) for f in chosen)
+        friendly = _streams_in_telegram(video) and _aac(chosen[-1])
+        return (known, friendly, video.get("height") or 0, video.get("fps") or 0,
+                sum(f.get("tbr") or 0 for f in chosen), len(chosen) == 1)
+
+    fitting = [c for c in candidates if sum(_size(f) for f in c) <= max_size]
+    return max(fitting, key=rank, default=None)
+
+
+def format_spec(chosen):
+    return "+".join(f["format_id"] for f in chosen)
+
+
+def streamable_size(chosen, min_size=10 * 1024**2, max_size=None):
+    """Exact size of the chosen format if it downloads as one sequential HTTP file.
+
+    Returns None for merged video+audio, fragmented (HLS/DASH) or unknown-size
+    formats, which cannot be uploaded while they download.
+    """
+    if len(chosen) != 1 or chosen[0].get("protocol") not in ("http", "https"):
+        return None
+    size = chosen[0].get("filesize")
+    if not size or size < min_size or (max_size and size > max_size):
+        return None
+    return size
+
+
+def normalize_url(url):
+    """Canonical form of a video link: youtu.be/shorts links become watch URLs, tracking params go."""
+    parts = urlsplit(url.strip())
+    host = parts.netloc.lower().removeprefix("www.").removeprefix("m.")
+    path = parts.path.rstrip("/")
+    query = [(k, v) for k, v in parse_qsl(parts.query) if k not in TRACKING_PARAMS and not k.startswith("utm_")]
+    if host == "youtu.be" and path:
+        host, query, path = "youtube.com", [("v", path.lstrip("/"))] + query, "/watch"
+    elif host == "youtube.com" and path.startswith("/shorts/"):
+        query, path = [("v", path.split("/")[2])] + query, "/watch"
+    return urlunsplit(("https", host, path, urlencode(sorted(query)), ""))
+
+
+def _info_key(url, ydl_opts):
+    return normalize_url(url), ydl_opts.get("format")
+
+
+async def cached_info(url, ydl_opts):
+    """Info dict for ``url``, extracted at most once per ``INFO_TTL``.
+
+    Concurrent callers for the same link and format await the same extraction; a
+    failed extraction is not cached.
+    """
+    now = time.time()
+    for key, (expires, _) in list(_info_cache.items()):
+        if expires < now:
+            del _info_cache[key]
+    key = _info_key(url, ydl_opts)
+    entry = _info_cache.get(key)
+    if entry is None:
+        future = asyncio.ensure_future(extract_info(url, ydl_opts))
+        entry = _info_cache[key] = (now + INFO_TTL, future)
+    try:
+        return await asyncio.shield(entry[1])
+    except Exception:
+        if _info_cache.get(key) is entry:
+            del _info_cache[key]
+        raise
+
+
+def forget_info(url, ydl_opts):
+    _info_cache.pop(_info_key(url, ydl_opts), None)
+
+
+async def download_info(url, info, ydl_opts, extract_opts=None):
+    """Download the formats of an already extracted ``info`` dict; returns the final info dict.
+
+    If the download fails, the cached info for ``url`` is dropped so a retry
+    extracts fresh (e.g. after the signed format URLs expired). ``extract_opts``
+    are the options ``info`` was extracted with, when the download uses others.
+    """
+    try:
+        return await asyncio.get_running_loop().run_in_executor(ytdl_pool(), ytdl_worker.download, info, ydl_opts)
+    except Exception:
+        forget_info(url, extract_opts or ydl_opts)
+        raise
+
+
+async def http_session():
+    """One aiohttp session shared by every thumbnail fetch."""
+    global _session
+    if _session is None or _session.closed:
+        _session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=30))
+    return _session
+
+
+async def fetch_thumbnail(url, path):
+    """Download a thumbnail to ``path``; returns the path or None."""
+    if not url:
+        return None
+    try:
+        session = await http_session()
+        async with session.get(url) as response:
+            if response.status != 200:
+                return None
+            async with aiofiles.open(path, 'wb') as f:
+                async for chunk in response.content.iter_chunked(64 * 1024):
+                    await f.write(chunk)
+        return path
+    except Exception as e:
+        print(f"Failed to download thumbnail: {e}")
+        return None
@@ -20,6 +20,7 @@ from pyrogram import filters
 from pyrogram.types import InlineKeyboardButton, InlineKeyboardMarkup
 from config import OWNER_ID
 from devgagan import app
+from devgagan.core.mongo import jobs_db
 
 async def aexec(code, client, message):
     exec(
@@ -223,4 +224,6 @@ async def shellrunner(_, message):
 @app.on_message(filters.command("restart") & filters.user(OWNER_ID))
 async def update(_, message):
     await message.reply("Restarting ... ")
+    # Running batches continue right after the restart instead of waiting to go stale
+    await jobs_db.release_jobs()
     os.execl(sys.executable, sys.executable, "-m", "devgagan")
@@ -19,6 +19,7 @@ import os
 import asyncio
 import string
 from devgagan.core.mongo import db
+from devgagan.core.userbot_pool import userbot_pool
 from devgagan.core.func import subscribe, chk_user
 from config import API_ID as api_id, API_HASH as api_hash
 from pyrogram.errors import (
@@ -62,6 +63,7 @@ async def clear_db(client, message):
         await db.remove_session(user_id)
     except Exception:
         pass
+    await userbot_pool.discard(user_id)
 
     if files_deleted:
         await message.reply("✅ Your session data and files have been cleared from memory and disk.")
@@ -19,13 +19,17 @@ import string
 import asyncio
 from pyrogram import filters, Client
 from devgagan import app
-from config import API_ID, API_HASH, FREEMIUM_LIMIT, PREMIUM_LIMIT, OWNER_ID
-from devgagan.core.get_func import get_msg
+from config import API_ID, API_HASH, FREEMIUM_LIMIT, PREMIUM_LIMIT, OWNER_ID, FREE_BATCH_WORKERS, PREMIUM_BATCH_WORKERS, BATCH_RATE, BATCH_PREFETCH, BATCH_DISK_BUDGET, BOT_ROLE
+from devgagan.core.get_func import get_msg, get_target_chat, settings_snapshot, apply_settings_snapshot
 from devgagan.core.func import *
-from devgagan.core.mongo import db
+from devgagan.core.mongo import db, jobs_db, settings_db
+from devgagan.core.userbot_pool import userbot_pool
+from devgagan.core.batch import run_batch, TokenBucket, StageStats
+from devgagan.core.scheduler import transfer_scheduler, plan_priority, queue_text, QueueFull
 from pyrogram.errors import FloodWait
 from datetime import datetime, timedelta
-from pyrogram.types import InlineKeyboardButton, InlineKeyboardMarkup
+from pyrogram.types import InlineKeyboardButton, InlineKeyboardMarkup, Message, Chat
+from pyrogram.enums import ChatType
 import subprocess
 from devgagan.modules.shrink import is_user_verified
 async def generate_random_name(length=8):
@@ -37,12 +41,8 @@ users_loop = {}
 interval_set = {}
 batch_mode = {}
 
-async def process_and_upload_link(userbot, user_id, msg_id, link, retry_count, message):
-    try:
-        await get_msg(userbot, user_id, msg_id, link, retry_count, message)
-        await asyncio.sleep(15)
-    finally:
-        pass
+async def process_and_upload_link(userbot, user_id, msg_id, link, retry_count, message, turn=None):
+    await get_msg(userbot, user_id, msg_id, link, retry_count, message, turn)
 
 # Function to check if the user can proceed
 async def check_interval(user_id, freecheck):
@@ -79,48 +79,52 @@ async def single_link(_, message):
     if await subscribe(_, message) == 1 or user_id in batch_mode:
         return
 
-    # Check if user is already in a loop
-    if users_loop.get(user_id, False):
-        await message.reply(
-            "You already have an ongoing process. Please wait for it to finish or cancel it with /cancel."
-        )
-        return
-
     # Check freemium limits
-    if await chk_user(message, user_id) == 1 and FREEMIUM_LIMIT == 0 and user_id not in OWNER_ID and not await is_user_verified(user_id):
+    freecheck = await chk_user(message, user_id)
+    if freecheck == 1 and FREEMIUM_LIMIT == 0 and user_id not in OWNER_ID and not await is_user_verified(user_id):
         await message.reply("Freemium service is currently not available. Upgrade to premium for access.")
         return
 
     # Check cooldown
-    can_proceed, response_message = await check_interval(user_id, await chk_user(message, user_id))
+    can_proceed, response_message = await check_interval(user_id, freecheck)
     if not can_proceed:
         await message.reply(response_message)
         return
 
-    # Add user to the loop
-    users_loop[user_id] = True
-
     link = message.text if "tg://openmessage" in message.text else get_link(message.text)
     msg = await message.reply("Processing...")
-    userbot = await initialize_userbot(user_id)
+    priority = plan_priority(user_id, freecheck, await is_user_verified(user_id))
+    userbot = None
 
     try:
-        if await is_normal_tg_link(link):
-            # Pass userbot if available; handle normal Telegram links
-            await process_and_upload_link(userbot, user_id, msg.id, link, 0, message)
+        # Waits for a transfer slot; the queue position and ETA are shown meanwhile
+        async with transfer_scheduler.slot(
+            user_id, priority,
+            on_queued=lambda position, eta: msg.edit_text(queue_text(position, eta))
+        ):
+            # Links queued together must not all pass the cooldown checked on arrival
+            can_proceed, response_message = await check_interval(user_id, freecheck)
+            if not can_proceed:
+                await message.reply(response_message)
+                return
             await set_interval(user_id, interval_minutes=45)
-        else:
-            # Handle special Telegram links
-            await process_special_links(userbot, user_id, msg, link)
+            await msg.edit_text("Processing...")
+            userbot = await initialize_userbot(user_id)
+            if await is_normal_tg_link(link):
+                # Pass userbot if available; handle normal Telegram links
+                await process_and_upload_link(userbot, user_id, msg.id, link, 0, message)
+            else:
+                # Handle special Telegram links
+                await process_special_links(userbot, user_id, msg, link)
             
+    except QueueFull as e:
+        await message.reply(str(e))
     except FloodWait as fw:
         await msg.edit_text(f'Try again after {fw.x} seconds due to floodwait from Telegram.')
     except Exception as e:
         await msg.edit_text(f"Link: `{link}`\n\n**Error:** {str(e)}")
     finally:
-        users_loop[user_id] = False
-        if userbot:
-            await userbot.stop()
+        await userbot_pool.release(userbot)
         try:
             await msg.delete()
         except Exception:
@@ -128,20 +132,11 @@ async def single_link(_, message):
 
 
 async def initialize_userbot(user_id): # this ensure the single startup .. even if logged in or not
-    """Initialize the userbot session for the given user."""
+    """Borrow a warm userbot for the given user from the pool; release it with userbot_pool.release."""
     data = await db.get_data(user_id)
     if data and data.get("session"):
         try:
-            device = 'iPhone 16 Pro' # added gareebi text
-            userbot = Client(
-                "userbot",
-                api_id=API_ID,
-                api_hash=API_HASH,
-                device_model=device,
-                session_string=data.get("session")
-            )
-            await userbot.start()
-            return userbot
+            return await userbot_pool.acquire(user_id, data.get("session"))
         except Exception:
             return None
     return None
@@ -159,7 +154,6 @@ async def process_special_links(userbot, user_id, msg, link):
         await msg.edit_text(result)
     elif any(sub in link for sub in ['t.me/c/', 't.me/b/', '/s/', 'tg://openmessage']):
         await process_and_upload_link(userbot, user_id, msg.id, link, 0, msg)
-        await set_interval(user_id, interval_minutes=45)
     else:
         await msg.edit_text("Invalid link format.")
 
@@ -170,8 +164,8 @@ async def batch_link(_, message):
     if join == 1:
         return
     user_id = message.chat.id
-    # Check if a batch process is already running
-    if users_loop.get(user_id, False):
+    # Check if a batch process is already running here or queued for a worker
+    if users_loop.get(user_id, False) or await jobs_db.active_job(user_id):
         await app.send_message(
             message.chat.id,
             "You already have a batch process running. Please wait for it to complete."
@@ -221,70 +215,179 @@ async def batch_link(_, message):
         await message.reply(response_message)
         return
         
-    join_button = InlineKeyboardButton("Join Channel", url="https://t.me/team_spy_pro")
-    keyboard = InlineKeyboardMarkup([[join_button]])
     pin_msg = await app.send_message(
         user_id,
         f"Batch process started ⚡\nProcessing: 0/{cl}\n\n**Powered by Team SPY**",
-        reply_markup=keyboard
+        reply_markup=batch_keyboard
     )
     await pin_msg.pin(both_sides=True)
 
+    job = await jobs_db.create_job(
+        user_id, start_id, cs, cl,
+        target_chat=await get_target_chat(user_id),
+        settings=await settings_snapshot(user_id),
+        freecheck=freecheck,
+        message_id=message.id,
+        pin_msg_id=pin_msg.id,
+        claim=BOT_ROLE != "frontend"
+    )
+    if BOT_ROLE == "frontend":
+        # A transfer worker claims the job and edits this message with its progress
+        await pin_msg.edit_text(
+            f"Batch queued ⏳\nProcessing: 0/{cl}\n\n**Powered by Team SPY**",
+            reply_markup=batch_keyboard
+        )
+        return
+    await run_batch_job(job, message, pin_msg)
+
+
+batch_keyboard = InlineKeyboardMarkup([[InlineKeyboardButton("Join Channel", url="https://t.me/team_spy_pro")]])
+
+async def run_batch_job(job, message, pin_msg):
+    """Deliver a claimed batch job from its cursor on, saving the cursor as it advances."""
+    user_id = job["user_id"]
+    start_id, cs, cl = job["link"], job["start"], job["count"]
+    freecheck = job["freecheck"]
+    # A worker process has none of the user's state; run with what the user had when queueing
+    apply_settings_snapshot(user_id, {"chat_id": job.get("target_chat", user_id), **(job.get("settings") or {})})
     users_loop[user_id] = True
+    userbot = None
+    status = jobs_db.FAILED
+    priority = plan_priority(user_id, freecheck, await is_user_verified(user_id))
+    beat = asyncio.create_task(job_heartbeat(job["_id"], user_id))
+    workers = FREE_BATCH_WORKERS if freecheck == 1 else PREMIUM_BATCH_WORKERS
     try:
-        normal_links_handled = False
-        userbot = await initialize_userbot(user_id)
-        # Handle normal links first
-        for i in range(cs, cs + cl):
-            if user_id in users_loop and users_loop[user_id]:
-                url = f"{'/'.join(start_id.split('/')[:-1])}/{i}"
-                link = get_link(url)
-                # Process t.me links (normal) without userbot
-                if 't.me/' in link and not any(x in link for x in ['t.me/b/', 't.me/c/', 'tg://openmessage']):
-                    msg = await app.send_message(message.chat.id, f"Processing...")
-                    await process_and_upload_link(userbot, user_id, msg.id, link, 0, message)
-                    await pin_msg.edit_text(
-                        f"Batch process started ⚡\nProcessing: {i - cs + 1}/{cl}\n\n**__Powered by Team SPY__**",
-                        reply_markup=keyboard
-                    )
-                    normal_links_handled = True
-        if normal_links_handled:
+        # The whole batch is one scheduler job holding a slot per transfer it runs at once
+        # Extra slots let the next messages download while the current one uploads
+        async with transfer_scheduler.slot(
+            user_id, priority,
+            on_queued=lambda position, eta: pin_msg.edit_text(queue_text(position, eta), reply_markup=batch_keyboard),
+            bounded=False,  # one batch per user already; a stored job must not fail on the queue limit
+            weight=workers + BATCH_PREFETCH,
+            kind="batch",
+            items=cs + cl - job["cursor"]
+        ) as slots:
+            userbot = await initialize_userbot(user_id)
+            base_link = '/'.join(start_id.split('/')[:-1])
+            links = {i: get_link(f"{base_link}/{i}") for i in range(job["cursor"], cs + cl)}
+            # A batch is either all public links (no userbot needed) or all private/bot links
+            normal = [i for i, link in links.items() if link and 't.me/' in link and not any(x in link for x in ['t.me/b/', 't.me/c/', 'tg://openmessage'])]
+            special = [i for i, link in links.items() if link and any(x in link for x in ['t.me/b/', 't.me/c/'])]
+            if not normal and special and not userbot:
+                await app.send_message(user_id, "Login in bot first ...")
+                return
+            indexes = normal or special
+            skipped = job["cursor"] - cs
+
+            # One status message per item, reused when the item is retried
+            status_msgs = {}
+
+            async def handle(i, turn):
+                if i not in status_msgs:
+                    status_msgs[i] = await app.send_message(user_id, "Processing...")
+                await process_and_upload_link(userbot, user_id, status_msgs[i].id, links[i], 0, message, turn)
+                status_msgs.pop(i, None)
+
+            stats = StageStats()
+
+            async def on_item_done(done, i, delivered):
+                if not await jobs_db.advance_job(job["_id"], indexes[delivered] if delivered < len(indexes) else cs + cl):
+                    # Another worker took the job over; it delivers the rest
+                    users_loop[user_id] = False
+                    return
+                throughput = stats.summary()
+                await pin_msg.edit_text(
+                    f"Batch process started ⚡\nProcessing: {skipped + done}/{cl}\n"
+                    + (f"{throughput}\n" if throughput else "")
+                    + "\n**__Powered by Team SPY__**",
+                    reply_markup=batch_keyboard
+                )
+
+            _, failed = await run_batch(
+                indexes,
+                handle,
+                concurrency=slots,
+                limiter=TokenBucket(BATCH_RATE, capacity=min(workers, slots)),
+                should_continue=lambda: users_loop.get(user_id, False),
+                on_item_done=on_item_done,
+                disk_budget=BATCH_DISK_BUDGET,
+                stats=stats
+            )
+            for msg in status_msgs.values():
+                try:
+                    await msg.delete()
+                except Exception:
+                    pass
+            if not users_loop.get(user_id, False):
+                status = jobs_db.CANCELLED
+                return
+
+            status = jobs_db.DONE
             await set_interval(user_id, interval_minutes=300)
+            skipped_text = (
+                f"\nSkipped {len(failed)} message(s) after retries: {', '.join(map(str, failed[:20]))}"
+                + (" ..." if len(failed) > 20 else "")
+            ) if failed else ""
             await pin_msg.edit_text(
-                f"Batch completed successfully for {cl} messages 🎉\n\n**__Powered by Team SPY__**",
-                reply_markup=keyboard
+                f"Batch completed successfully for {cl} messages 🎉{skipped_text}\n\n**__Powered by Team SPY__**",
+                reply_markup=batch_keyboard
             )
-            await app.send_message(message.chat.id, "Batch completed successfully! 🎉")
-            return
-            
-        # Handle special links with userbot
-        for i in range(cs, cs + cl):
-            if not userbot:
-                await app.send_message(message.chat.id, "Login in bot first ...")
-                users_loop[user_id] = False
-                return
-            if user_id in users_loop and users_loop[user_id]:
-                url = f"{'/'.join(start_id.split('/')[:-1])}/{i}"
-                link = get_link(url)
-                if any(x in link for x in ['t.me/b/', 't.me/c/']):
-                    msg = await app.send_message(message.chat.id, f"Processing...")
-                    await process_and_upload_link(userbot, user_id, msg.id, link, 0, message)
-                    await pin_msg.edit_text(
-                        f"Batch process started ⚡\nProcessing: {i - cs + 1}/{cl}\n\n**__Powered by Team SPY__**",
-                        reply_markup=keyboard
-                    )
-
-        await set_interval(user_id, interval_minutes=300)
-        await pin_msg.edit_text(
-            f"Batch completed successfully for {cl} messages 🎉\n\n**__Powered by Team SPY__**",
-            reply_markup=keyboard
-        )
-        await app.send_message(message.chat.id, "Batch completed successfully! 🎉")
+            await app.send_message(user_id, f"Batch completed successfully! 🎉{skipped_text}")
 
     except Exception as e:
-        await app.send_message(message.chat.id, f"Error: {e}")
+        await app.send_message(user_id, f"Error: {e}")
     finally:
+        beat.cancel()
+        await jobs_db.finish_job(job["_id"], status)
         users_loop.pop(user_id, None)
+        await userbot_pool.release(userbot)
+
+async def job_heartbeat(job_id, user_id):
+    """Keep the job claimed; stop it on a /cancel sent to another process or once another worker owns it."""
+    while True:
+        await asyncio.sleep(jobs_db.STALE_AFTER / 4)
+        try:
+            if not await jobs_db.heartbeat(job_id):
+                users_loop[user_id] = False
+        except Exception as e:
+            print(f"Job heartbeat error: {e}")
+
+async def resume_job(job_id):
+    """Claim a queued batch, or one left behind by a restart, and run it from its cursor."""
+    job = await jobs_db.claim_job(job_id)
+    if not job:
+        return
+    user_id = job["user_id"]
+    if users_loop.get(user_id, False):
+        # The user's batch started here between the scan and the claim; wait for it
+        await jobs_db.unclaim_job(job_id)
+        return
+    message = await app.get_messages(user_id, job["message_id"])
+    if not message or message.empty:
+        message = Message(id=job["message_id"], chat=Chat(id=user_id, type=ChatType.PRIVATE))
+    pin_msg = None
+    if job["cursor"] == job["start"]:
+        # Queued by a front-end and not started yet: keep reporting on its message
+        try:
+            pin_msg = await app.get_messages(user_id, job["pin_msg_id"])
+        except Exception:
+            pin_msg = None
+    if not pin_msg or pin_msg.empty:
+        pin_msg = await app.send_message(
+            user_id,
+            f"Batch resumed after a restart ♻️\nProcessing: {job['cursor'] - job['start']}/{job['count']}\n\n**Powered by Team SPY**",
+            reply_markup=batch_keyboard
+        )
+    await run_batch_job(job, message, pin_msg)
+
+async def resume_batch_jobs():
+    """Start every pending or orphaned batch job; returns how many were found."""
+    jobs = await jobs_db.claimable_jobs()
+    for job in jobs:
+        # A user runs one batch at a time; theirs stays queued until the running one ends
+        if not users_loop.get(job["user_id"], False):
+            asyncio.create_task(resume_job(job["_id"]))
+    return len(jobs)
 
 @app.on_message(filters.command("cancel"))
 async def stop_batch(_, message):
@@ -302,6 +405,12 @@ async def stop_batch(_, message):
             message.chat.id, 
             "The batch process was already stopped. No active batch to cancel."
         )
+    elif await jobs_db.request_cancel(user_id):
+        # The batch is queued or runs on a transfer worker
+        await app.send_message(
+            message.chat.id,
+            "Batch processing has been stopped successfully. You can start a new batch now if you want."
+        )
     else:
         await app.send_message(
             message.chat.id, 
@@ -22,13 +22,8 @@ import aiohttp
 from devgagan import app
 from devgagan.core.func import *
 from datetime import datetime, timedelta
-from motor.motor_asyncio import AsyncIOMotorClient
-from config import MONGO_DB, WEBSITE_URL, AD_API, LOG_GROUP  
- 
- 
-tclient = AsyncIOMotorClient(MONGO_DB)
-tdb = tclient["telegram_bot"]
-token = tdb["tokens"]
+from config import WEBSITE_URL, AD_API, LOG_GROUP  
+from devgagan.core.mongo.client import tokens as token
  
  
 async def create_ttl_index():
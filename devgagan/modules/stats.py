@@ -20,8 +20,13 @@ import motor
 from devgagan import app
 from pyrogram import filters
 from config import OWNER_ID
-from devgagan.core.mongo.users_db import get_users, add_user, get_user
+from devgagan.core.mongo.users_db import add_user, count_users
 from devgagan.core.mongo.plans_db import premium_users
+from devgagan.core.mongo.client import pool_stats
+from devgagan.core.scheduler import transfer_scheduler
+from devgagan.core.mongo.jobs_db import job_counts
+from devgagan.core.file_cache import file_cache
+from devgagan.core.func import humanbytes
 
 
 
@@ -31,9 +36,7 @@ start_time = time.time()
 async def chat_watcher_func(_, message):
     try:
         if message.from_user:
-            us_in_db = await get_user(message.from_user.id)
-            if not us_in_db:
-                await add_user(message.from_user.id)
+            await add_user(message.from_user.id)
     except:
         pass
 
@@ -63,9 +66,13 @@ def time_formatter():
 @app.on_message(filters.command("stats") & filters.user(OWNER_ID))
 async def stats(client, message):
     start = time.time()
-    users = len(await get_users())
+    users = await count_users()
     premium = await premium_users()
     ping = round((time.time() - start) * 1000)
+    pool = pool_stats.as_dict()
+    jobs = transfer_scheduler.stats()
+    batches = await job_counts()
+    cache = file_cache.stats()
     await message.reply_text(f"""
 **Stats of** {(await client.get_me()).mention} :
 
@@ -77,5 +84,9 @@ async def stats(client, message):
     
 🎨 **Python Version**: `{sys.version.split()[0]}`
 📑 **Mongo Version**: `{motor.version}`
+🔌 **Mongo Pool**: `{pool['in_use']}/{pool['open']} in use, max {pool['max']}, {pool['checkout_failed']} failed checkouts`
+🚚 **Transfers**: `{jobs['active']}/{jobs['slots']} running, {jobs['queued']} queued`
+🗂 **Batch Jobs**: `{batches['running']} running, {batches['pending']} waiting for a worker`
+💾 **File Cache**: `{cache['files']} files, {humanbytes(cache['size']) or '0 B'} of {humanbytes(cache['budget']) or '0 B'}`
 """)
   
@@ -20,7 +20,6 @@ import time
 import asyncio
 import random
 import string
-import requests
 import logging
 import cv2
 from devgagan import sex as client
@@ -28,51 +27,28 @@ from pyrogram import Client,filters
 from telethon import events
 from telethon.sync import TelegramClient
 from telethon.tl.types import DocumentAttributeVideo
-from devgagan.core.func import screenshot, video_metadata, progress_bar
+from devgagan.core.func import progress_bar, progress_reporter
+from devgagan.core.media_probe import probe_media, faststart
+from devgagan.core.parts import upload_file_parts, MAX_PART_SIZE
+from devgagan.core import scratch
+from devgagan.core.ytdl_runner import (
+    cached_info, download_info, fetch_thumbnail, normalize_url, select_format, format_spec, streamable_size
+)
+from devgagan.core.stream_upload import upload_growing_file, MAX_STREAM_SIZE
+from devgagan.core.func import chk_user
+from devgagan.core.scheduler import transfer_scheduler, plan_priority, queue_text, PREMIUM, QueueFull
+from config import FREE_DL_SIZE, PREMIUM_DL_SIZE
+from devgagan.modules.shrink import is_user_verified
 from telethon.tl.functions.messages import EditMessageRequest
 from devgagantools import fast_upload
-from concurrent.futures import ThreadPoolExecutor
-import aiohttp 
 from devgagan import app
 import logging
-import aiofiles
 from mutagen.id3 import ID3, TIT2, TPE1, COMM, APIC
 from mutagen.mp3 import MP3
  
 logger = logging.getLogger(__name__)
  
  
-thread_pool = ThreadPoolExecutor()
-ongoing_downloads = {}
- 
-def d_thumbnail(thumbnail_url, save_path):
-    try:
-        response = requests.get(thumbnail_url, stream=True)
-        response.raise_for_status()
-        with open(save_path, 'wb') as f:
-            for chunk in response.iter_content(chunk_size=8192):
-                f.write(chunk)
-        return save_path
-    except requests.exceptions.RequestException as e:
-        logger.error(f"Failed to download thumbnail: {e}")
-        return None
- 
- 
-async def download_thumbnail_async(url, path):
-    async with aiohttp.ClientSession() as session:
-        async with session.get(url) as response:
-            if response.status == 200:
-                with open(path, 'wb') as f:
-                    f.write(await response.read())
- 
- 
-async def extract_audio_async(ydl_opts, url):
-    def sync_extract():
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            return ydl.extract_info(url, download=True)
-    return await asyncio.get_event_loop().run_in_executor(thread_pool, sync_extract)
- 
- 
 def get_random_string(length=7):
     characters = string.ascii_letters + string.digits
     return ''.join(random.choice(characters) for _ in range(length)) 
@@ -90,30 +66,34 @@ async def process_audio(client, event, url, cookies_env_var=None):
             temp_cookie_path = temp_cookie_file.name
  
     start_time = time.time()
-    random_filename = f"@team_spy_pro_{event.sender_id}"
-    download_path = f"{random_filename}.mp3"
- 
-    ydl_opts = {
-        'format': 'bestaudio/best',
-        'outtmpl': f"{random_filename}.%(ext)s",
-        'cookiefile': temp_cookie_path,
-        'postprocessors': [{'key': 'FFmpegExtractAudio', 'preferredcodec': 'mp3', 'preferredquality': '192'}],
-        'quiet': False,
-        'noplaylist': True,
-    }
     prog = None
+    job = None
  
     progress_message = await event.reply("**__Starting audio extraction...__**")
  
     try:
+        job = scratch.lease("adl", event.sender_id, get_random_string())
+        random_filename = os.path.join(job, f"@team_spy_pro_{event.sender_id}")
+        download_path = f"{random_filename}.mp3"
+ 
+        ydl_opts = {
+            'format': 'bestaudio/best',
+            'outtmpl': f"{random_filename}.%(ext)s",
+            'cookiefile': temp_cookie_path,
+            'postprocessors': [{'key': 'FFmpegExtractAudio', 'preferredcodec': 'mp3', 'preferredquality': '192'}],
+            'quiet': False,
+            'noplaylist': True,
+        }
          
-        info_dict = await extract_audio_async(ydl_opts, url)
+        info_dict = await download_info(url, await cached_info(url, ydl_opts), ydl_opts)
         title = info_dict.get('title', 'Extracted Audio')
  
         await progress_message.edit("**__Editing metadata...__**")
  
          
         if os.path.exists(download_path):
+            cover = await fetch_thumbnail(info_dict.get('thumbnail'), os.path.join(job, "cover.jpg"))
+
             def edit_metadata():
                 audio_file = MP3(download_path, ID3=ID3)
                 try:
@@ -124,15 +104,11 @@ async def process_audio(client, event, url, cookies_env_var=None):
                 audio_file.tags["TPE1"] = TPE1(encoding=3, text="Team SPY")
                 audio_file.tags["COMM"] = COMM(encoding=3, lang="eng", desc="Comment", text="Processed by Team SPY")
  
-                thumbnail_url = info_dict.get('thumbnail')
-                if thumbnail_url:
-                    thumbnail_path = os.path.join(tempfile.gettempdir(), "thumb.jpg")
-                    asyncio.run(download_thumbnail_async(thumbnail_url, thumbnail_path))
-                    with open(thumbnail_path, 'rb') as img:
+                if cover:
+                    with open(cover, 'rb') as img:
                         audio_file.tags["APIC"] = APIC(
                             encoding=3, mime='image/jpeg', type=3, desc='Cover', data=img.read()
                         )
-                    os.remove(thumbnail_path)
                 audio_file.save()
  
             await asyncio.to_thread(edit_metadata)
@@ -146,13 +122,14 @@ async def process_audio(client, event, url, cookies_env_var=None):
             prog = await client.send_message(chat_id, "**__Starting Upload...__**")
             uploaded = await fast_upload(
                 client, download_path, 
-                reply=prog, 
+                reply=progress_reporter(prog), 
                 name=None,
                 progress_bar_function=lambda done, total: progress_callback(done, total, chat_id)
             )
-            await client.send_file(chat_id, uploaded, caption=f"**{title}**\n\n**__Powered by Team SPY__**")
+            sent = await client.send_file(chat_id, uploaded, caption=f"**{title}**\n\n**__Powered by Team SPY__**")
             if prog:
                 await prog.delete()
+            return sent
         else:
             await event.reply("**__Audio file not found after extraction!__**")
  
@@ -160,71 +137,114 @@ async def process_audio(client, event, url, cookies_env_var=None):
         logger.exception("Error during audio extraction or upload")
         await event.reply(f"**__An error occurred: {e}__**")
     finally:
-        if os.path.exists(download_path):
-            os.remove(download_path)
+        if job:
+            scratch.release(job)
         if temp_cookie_path and os.path.exists(temp_cookie_path):
             os.remove(temp_cookie_path)
  
+async def user_priority(user_id):
+    freecheck = await chk_user(None, user_id)
+    return plan_priority(user_id, freecheck, freecheck == 1 and await is_user_verified(user_id))
+ 
+ 
+def queue_notice(event):
+    """Reply with the queue position once when a job has to wait for a transfer slot."""
+    async def notify(position, eta):
+        await event.reply(queue_text(position, eta))
+    return notify
+ 
+ 
+SHARE_TTL = 3600  # seconds a finished upload is re-sent to new requesters of the same link
+# (command, normalized url) -> (expires_at, future of the sent Message or None)
+_flights = {}
+ 
+ 
+async def single_flight(event, key, run):
+    """Run ``run()`` once per ``key``; later requesters of the same link get its upload re-sent.
+
+    Requests that arrive while the first one is still running wait for it instead of
+    downloading again. If it fails, or re-sending its file does, the request runs itself.
+    """
+    now = time.time()
+    for k, (expires, future) in list(_flights.items()):
+        if expires < now and future.done():
+            del _flights[k]
+    entry = _flights.get(key)
+    if entry:
+        future = entry[1]
+        notice = None
+        if not future.done():
+            notice = await event.reply("**__This link is already being processed, you will get it shortly...__**")
+        sent = await asyncio.shield(future)
+        if notice:
+            await notice.delete()
+        if sent:
+            try:
+                await client.send_file(event.chat_id, sent.media, caption=sent.text)
+                return
+            except Exception as e:
+                logger.info(f"Re-sending shared upload failed: {e}")
+        if _flights.get(key, (0, None))[1] is future:
+            del _flights[key]
+        return await single_flight(event, key, run)
+ 
+    future = asyncio.get_running_loop().create_future()
+    _flights[key] = (now + SHARE_TTL, future)
+    sent = None
+    try:
+        sent = await run()
+    finally:
+        future.set_result(sent)
+        if _flights.get(key, (0, None))[1] is future:
+            if sent:
+                _flights[key] = (time.time() + SHARE_TTL, future)
+            else:
+                del _flights[key]
+ 
+ 
 @client.on(events.NewMessage(pattern="/adl"))
 async def handler(event):
     user_id = event.sender_id
-    if user_id in ongoing_downloads:
-        await event.reply("**You already have an ongoing download. Please wait until it completes!**")
-        return
- 
     if len(event.message.text.split()) < 2:
         await event.reply("**Usage:** `/adl <video-link>`\n\nPlease provide a valid video link!")
         return    
  
     url = event.message.text.split()[1]
-    ongoing_downloads[user_id] = True
+ 
+    async def run():
+        async with transfer_scheduler.slot(user_id, await user_priority(user_id), on_queued=queue_notice(event), kind="adl"):
+            if "instagram.com" in url:
+                return await process_audio(client, event, url, cookies_env_var="INSTA_COOKIES")
+            elif "youtube.com" in url or "youtu.be" in url:
+                return await process_audio(client, event, url, cookies_env_var="YT_COOKIES")
+            else:
+                return await process_audio(client, event, url)
  
     try:
-        if "instagram.com" in url:
-            await process_audio(client, event, url, cookies_env_var="INSTA_COOKIES")
-        elif "youtube.com" in url or "youtu.be" in url:
-            await process_audio(client, event, url, cookies_env_var="YT_COOKIES")
-        else:
-            await process_audio(client, event, url)
+        await single_flight(event, ("adl", normalize_url(url)), run)
+    except QueueFull as e:
+        await event.reply(str(e))
     except Exception as e:
         await event.reply(f"**An error occurred:** `{e}`")
-    finally:
-        ongoing_downloads.pop(user_id, None)
  
  
 async def fetch_video_info(url, ydl_opts, progress_message, check_duration_and_size):
-    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-        info_dict = ydl.extract_info(url, download=False)
- 
-        if check_duration_and_size:
-             
-            duration = info_dict.get('duration', 0)
-            if duration and duration > 3 * 3600:   
-                await progress_message.edit("**❌ __Video is longer than 3 hours. Download aborted...__**")
-                return None
+    info_dict = await cached_info(url, ydl_opts)
  
-             
-            estimated_size = info_dict.get('filesize_approx', 0)
-            if estimated_size and estimated_size > 2 * 1024 * 1024 * 1024:   
-                await progress_message.edit("**🤞 __Video size is larger than 2GB. Aborting download.__**")
-                return None
- 
-        return info_dict
+    if check_duration_and_size:
+         
+        duration = info_dict.get('duration', 0)
+        if duration and duration > 3 * 3600:   
+            await progress_message.edit("**❌ __Video is longer than 3 hours. Download aborted...__**")
+            return None
  
-def download_video(url, ydl_opts):
-    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-        ydl.download([url])
+    return info_dict
  
  
 @client.on(events.NewMessage(pattern="/dl"))
 async def handler(event):
     user_id = event.sender_id
  
-     
-    if user_id in ongoing_downloads:
-        await event.reply("**You already have an ongoing ytdlp download. Please wait until it completes!**")
-        return
- 
     if len(event.message.text.split()) < 2:
         await event.reply("**Usage:** `/dl <video-link>`\n\nPlease provide a valid video link!")
         return    
@@ -232,19 +252,25 @@ async def handler(event):
     url = event.message.text.split()[1]
  
      
-    try:
-        if "instagram.com" in url:
-            await process_video(client, event, url, "INSTA_COOKIES", check_duration_and_size=False)
-        elif "youtube.com" in url or "youtu.be" in url:
-            await process_video(client, event, url, "YT_COOKIES", check_duration_and_size=True)
-        else:
-            await process_video(client, event, url, None, check_duration_and_size=False)
+    priority = await user_priority(user_id)
+    max_size = PREMIUM_DL_SIZE if priority <= PREMIUM else FREE_DL_SIZE
+ 
+    async def run():
+        async with transfer_scheduler.slot(user_id, priority, on_queued=queue_notice(event), kind="dl"):
+            if "instagram.com" in url:
+                return await process_video(client, event, url, "INSTA_COOKIES", False, max_size)
+            elif "youtube.com" in url or "youtu.be" in url:
+                return await process_video(client, event, url, "YT_COOKIES", True, max_size)
+            else:
+                return await process_video(client, event, url, None, False, max_size)
  
+    try:
+        # The size cap decides the format, so only users of the same cap share a job
+        await single_flight(event, ("dl", normalize_url(url), max_size), run)
+    except QueueFull as e:
+        await event.reply(str(e))
     except Exception as e:
         await event.reply(f"**An error occurred:** `{e}`")
-    finally:
-         
-        ongoing_downloads.pop(user_id, None)
  
  
  
@@ -313,7 +339,7 @@ def progress_callback(done, total, user_id):
  
     return final
  
-async def process_video(client, event, url, cookies_env_var, check_duration_and_size=False):
+async def process_video(client, event, url, cookies_env_var, check_duration_and_size=False, max_size=FREE_DL_SIZE):
     start_time = time.time()
     logger.info(f"Received link: {url}")
      
@@ -322,11 +348,6 @@ async def process_video(client, event, url, cookies_env_var, check_duration_and_
         cookies = os.getenv(cookies_env_var)
  
      
-    random_filename = get_random_string() + ".mp4"
-    download_path = os.path.abspath(random_filename)
-    logger.info(f"Generated random download path: {download_path}")
- 
-     
     temp_cookie_path = None
     if cookies:
         with tempfile.NamedTemporaryFile(delete=False, mode='w', suffix='.txt') as temp_cookie_file:
@@ -339,66 +360,117 @@ async def process_video(client, event, url, cookies_env_var, check_duration_and_
     metadata = {'width': None, 'height': None, 'duration': None, 'thumbnail': None}
  
      
-    ydl_opts = {
-        'outtmpl': download_path,
-        'format': 'best',
-        'cookiefile': temp_cookie_path if temp_cookie_path else None,
-        'writethumbnail': True,
-        'verbose': True,
-    }
     prog = None
+    job = None
+    reserved = 0
     progress_message = await event.reply("**__Starting download...__**")
     logger.info("Starting the download process...")
     try:
+        job = scratch.lease("dl", event.sender_id, get_random_string())
+        base_path = os.path.join(job, get_random_string())
+        download_path = f"{base_path}.mp4"
+        logger.info(f"Generated random download path: {download_path}")
+        # The format is chosen from the extracted info; whatever is downloaded ends up as
+        # an MP4 with its index up front, by stream copy (no re-encode)
+        ydl_opts = {
+            'outtmpl': f"{base_path}.%(ext)s",
+            'cookiefile': temp_cookie_path if temp_cookie_path else None,
+            'merge_output_format': 'mp4',
+            'postprocessors': [{'key': 'FFmpegVideoRemuxer', 'preferedformat': 'mp4'}],
+            'postprocessor_args': {
+                'merger+ffmpeg_o': ['-movflags', '+faststart'],
+                'videoremuxer+ffmpeg_o': ['-movflags', '+faststart'],
+            },
+            'verbose': True,
+        }
         info_dict = await fetch_video_info(url, ydl_opts, progress_message, check_duration_and_size)
         if not info_dict:
             return
+        chosen = select_format(info_dict, max_size)
+        if not chosen:
+            await progress_message.edit(f"**🤞 __No format of this video fits your {max_size // 1024**2} MB limit. Aborting download.__**")
+            return
+        download_opts = {**ydl_opts, 'format': format_spec(chosen)}
+        try:
+            # Reserved, not just checked, so concurrent /dl jobs cannot overcommit the disk
+            expected_size = sum(f.get('filesize') or f.get('filesize_approx') or 0 for f in chosen)
+            scratch.admit(expected_size)
+            reserved = expected_size
+        except scratch.NoSpace:
+            await progress_message.edit("**⚠️ __Not enough free disk space right now. Please try again in a few minutes.__**")
+            return
          
-        await asyncio.to_thread(download_video, url, ydl_opts)
+        # A single HTTP MP4 of known size is uploaded while it downloads; it has to be
+        # written in place (no .part file) for the upload to follow it
+        stream_size = streamable_size(chosen, max_size=MAX_STREAM_SIZE) if chosen[0].get('ext') == 'mp4' else None
+        if stream_size:
+            download_opts['nopart'] = True
+ 
+        # The download (in a yt-dlp worker process) and the thumbnail fetch overlap
+        download = asyncio.ensure_future(download_info(url, info_dict, download_opts, ydl_opts))
+        thumbnail = asyncio.ensure_future(
+            fetch_thumbnail(info_dict.get('thumbnail'), os.path.join(job, get_random_string() + ".jpg"))
+        )
+        uploaded = None
+        if stream_size:
+            await progress_message.edit("**__Downloading and uploading...__**")
+            try:
+                uploaded = await upload_growing_file(
+                    client, download_path, stream_size, download,
+                    progress=progress_bar,
+                    progress_args=("╭─────────────────────╮\n│      **__Streaming Upload__**\n├─────────────────────", progress_message, time.time())
+                )
+            except Exception as e:
+                logger.info(f"Streaming upload failed, uploading after the download: {e}")
+        result, thumbnail_file = await asyncio.gather(download, thumbnail)
+        download_path = next(
+            (d['filepath'] for d in result.get('requested_downloads') or [] if d.get('filepath')), download_path
+        )
+        if uploaded and not (os.path.exists(download_path) and os.path.getsize(download_path) == stream_size):
+            # A post-processor rewrote the file, so the streamed copy is stale
+            uploaded = None
+        # Merged and remuxed files got +faststart from ffmpeg already; a single MP4
+        # is left as served, so move its index to the front here if needed
+        if len(chosen) == 1 and download_path.endswith(".mp4") and os.path.exists(download_path):
+            if await faststart(download_path):
+                uploaded = None
         title = info_dict.get('title', 'Powered by Team SPY')
-        k = video_metadata(download_path)      
+        k = await probe_media(download_path, thumbnail=False)
         W = k['width']
         H = k['height']
         D = k['duration']
         metadata['width'] = info_dict.get('width') or W
         metadata['height'] = info_dict.get('height') or H
         metadata['duration'] = int(info_dict.get('duration') or 0) or D
-        thumbnail_url = info_dict.get('thumbnail', None)
         THUMB = None
  
-         
-        if thumbnail_url:
-            thumbnail_file = os.path.join(tempfile.gettempdir(), get_random_string() + ".jpg")
-            downloaded_thumb = d_thumbnail(thumbnail_url, thumbnail_file)
-            if downloaded_thumb:
-                logger.info(f"Thumbnail saved at: {downloaded_thumb}")
- 
         if thumbnail_file:
             THUMB = thumbnail_file
         else:
-            THUMB = await screenshot(download_path, metadata['duration'], event.sender_id)
+            THUMB = (await probe_media(download_path, event.sender_id))['thumb']
  
          
  
          
         chat_id = event.chat_id
-        SIZE = 2 * 1024 * 1024
         caption = f"{title}"
      
-        if os.path.exists(download_path) and os.path.getsize(download_path) > SIZE:
+        # Only files over Telegram's upload limit are split
+        if os.path.exists(download_path) and os.path.getsize(download_path) > MAX_PART_SIZE:
+            await progress_message.delete()
             prog = await client.send_message(chat_id, "**__Starting Upload...__**")
             await split_and_upload_file(app, chat_id, download_path, caption)
             await prog.delete()
-         
-        if os.path.exists(download_path):
+        elif os.path.exists(download_path):
             await progress_message.delete()
-            prog = await client.send_message(chat_id, "**__Starting Upload...__**")
-            uploaded = await fast_upload(
-                client, download_path,
-                reply=prog,
-                progress_bar_function=lambda done, total: progress_callback(done, total, chat_id)
-            )
-            await client.send_file(
+            if not uploaded:
+                prog = await client.send_message(chat_id, "**__Starting Upload...__**")
+                uploaded = await fast_upload(
+                    client, download_path,
+                    reply=progress_reporter(prog),
+                    progress_bar_function=lambda done, total: progress_callback(done, total, chat_id)
+                )
+            sent = await client.send_file(
                 event.chat_id,
                 uploaded,
                 caption=f"**{title}**",
@@ -414,19 +486,18 @@ async def process_video(client, event, url, cookies_env_var, check_duration_and_
             )
             if prog:
                 await prog.delete()
+            return sent
         else:
             await event.reply("**__File not found after download. Something went wrong!__**")
     except Exception as e:
         logger.exception("An error occurred during download or upload.")
         await event.reply(f"**__An error occurred: {e}__**")
     finally:
-         
-        if os.path.exists(download_path):
-            os.remove(download_path)
+        # Takes the video, its thumbnails and any yt-dlp leftovers with it
+        if job:
+            scratch.release(job, reserved)
         if temp_cookie_path and os.path.exists(temp_cookie_path):
             os.remove(temp_cookie_path)
-        if thumbnail_file and os.path.exists(thumbnail_file):
-            os.remove(thumbnail_file)
  
 
 async def split_and_upload_file(app, sender, file_path, caption):
@@ -436,35 +507,15 @@ async def split_and_upload_file(app, sender, file_path, caption):
 
     file_size = os.path.getsize(file_path)
     start = await app.send_message(sender, f"ℹ️ File size: {file_size / (1024 * 1024):.2f} MB")
-    PART_SIZE =  1.9 * 1024 * 1024 * 1024
-
-    part_number = 0
-    async with aiofiles.open(file_path, mode="rb") as f:
-        while True:
-            chunk = await f.read(PART_SIZE)
-            if not chunk:
-                break
-
-            # Create part filename
-            base_name, file_ext = os.path.splitext(file_path)
-            part_file = f"{base_name}.part{str(part_number).zfill(3)}{file_ext}"
-
-            # Write part to file
-            async with aiofiles.open(part_file, mode="wb") as part_f:
-                await part_f.write(chunk)
-
-            # Uploading part
-            edit = await app.send_message(sender, f"⬆️ Uploading part {part_number + 1}...")
-            part_caption = f"{caption} \n\n**Part : {part_number + 1}**"
-            await app.send_document(sender, document=part_file, caption=part_caption,
-                progress=progress_bar,
-                progress_args=("╭─────────────────────╮\n│      **__Pyro Uploader__**\n├─────────────────────", edit, time.time())
-            )
-            await edit.delete()
-            os.remove(part_file)  # Cleanup after upload
-
-            part_number += 1
+    PART_SIZE = int(1.9 * 1024 * 1024 * 1024)
 
+    # Parts are byte ranges of the original file: no part files, no 1.9 GB buffers
+    edit = await app.send_message(sender, "⬆️ Uploading parts...")
+    await upload_file_parts(
+        app, sender, file_path, caption, part_size=PART_SIZE,
+        progress=progress_bar,
+        progress_args=("╭─────────────────────╮\n│      **__Pyro Uploader__**\n├─────────────────────", edit, time.time())
+    )
+    await edit.delete()
     await start.delete()
     os.remove(file_path)
- 
@@ -0,0 +1,91 @@
+import asyncio
+import importlib.util
+import os
+import sys
+import types
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def load(name):
+    # devgagan/__init__.py logs the bots in on import, so load the module files
+    # under bare package entries instead
+    for package in ("devgagan", "devgagan.core"):
+        if package not in sys.modules:
+            module = types.ModuleType(package)
+            module.__path__ = [os.path.join(ROOT, *package.split("."))]
+            sys.modules[package] = module
+    spec = importlib.util.spec_from_file_location(name, os.path.join(ROOT, *name.split(".")) + ".py")
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+parallel = load("devgagan.core.parallel_download")
+CHUNK = parallel.CHUNK_SIZE
+
+
+class FakeMessage:
+    id = 1
+    media = None
+    chat = types.SimpleNamespace(id=1)
+
+
+class FakeClient:
+    """Serves chunk ``i`` as bytes of value ``i % 256`` behind Pyrogram's get_file semaphore."""
+
+    def __init__(self, max_concurrent_transmissions, short_once=()):
+        self.max_concurrent_transmissions = max_concurrent_transmissions
+        self.semaphore = asyncio.Semaphore(max_concurrent_transmissions)
+        self.active = 0
+        self.peak = 0
+        self.short_once = set(short_once)
+        self.refreshed = 0
+
+    async def get_messages(self, chat_id, message_id):
+        self.refreshed += 1
+        return FakeMessage()
+
+    async def stream_media(self, message, limit, offset):
+        async with self.semaphore:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+            try:
+                for index in range(offset, offset + limit):
+                    if index in self.short_once:
+                        self.short_once.discard(index)
+                        return
+                    await asyncio.sleep(0.001)
+                    yield bytes([index % 256]) * CHUNK
+            finally:
+                self.active -= 1
+
+
+def download(tmp_path, client, chunks, connections):
+    size = chunks * CHUNK
+    path = asyncio.run(parallel.parallel_download(
+        client, FakeMessage(), "file.bin", size, connections=connections, directory=str(tmp_path)
+    ))
+    with open(path, "rb") as f:
+        data = f.read()
+    assert data == b"".join(bytes([i % 256]) * CHUNK for i in range(chunks))
+
+
+def test_segments_overlap(tmp_path):
+    client = FakeClient(max_concurrent_transmissions=4)
+    download(tmp_path, client, chunks=4 * parallel.SEGMENT_CHUNKS, connections=4)
+    assert client.peak == 4
+
+
+def test_workers_capped_by_client_transmissions(tmp_path):
+    client = FakeClient(max_concurrent_transmissions=1)
+    download(tmp_path, client, chunks=2 * parallel.SEGMENT_CHUNKS, connections=4)
+    assert client.peak == 1
+
+
+def test_short_segment_is_refetched(tmp_path):
+    client = FakeClient(max_concurrent_transmissions=2, short_once={parallel.SEGMENT_CHUNKS + 3})
+    download(tmp_path, client, chunks=2 * parallel.SEGMENT_CHUNKS, connections=2)
+    assert client.refreshed == 1
@@ -0,0 +1,32 @@
+# ---------------------------------------------------
+# File Name: ytdl_worker.py
+# Description: A Pyrogram bot for downloading files from Telegram channels or groups
+#              and uploading them back to Telegram.
+# Author: Gagan
+# GitHub: https://github.com/devgaganin/
+# Telegram: https://t.me/team_spy_pro
+# YouTube: https://youtube.com/@dev_gagan
+# Created: 2025-01-11
+# Last Modified: 2025-01-11
+# Version: 2.0.5
+# License: MIT License
+# ---------------------------------------------------
+
+# Code run inside the yt-dlp worker processes. It lives outside the devgagan
+# package on purpose: the workers are spawned, and importing devgagan would
+# connect to MongoDB and log the bot in again in every one of them.
+
+import yt_dlp
+
+
+def extract(url, ydl_opts, download):
+    # The sanitized info dict is plain data and pickles back to the bot
+    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        return ydl.sanitize_info(ydl.extract_info(url, download=download))
+
+
+def download(info, ydl_opts):
+    # Same path as --load-info-json: format selection and download run on the given
+    # info dict, so the page is not extracted a second time
+    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        return ydl.sanitize_info(ydl.process_ie_result(ydl.sanitize_info(info, True), download=True))